@@ -0,0 +1,350 @@
+"""Benchmarks of the generation and solver engines across maze sizes.
+
+Every engine runs on square mazes of each size with a fixed seed, once with the
+visualization hooks stubbed out and once with them active, and reports the
+best time of a few runs, the tracemalloc peak memory and the number of cells
+expanded by the solvers:
+
+    python benchmark.py --sizes 11 101 501 --baseline benchmark_baseline.json
+
+Results are compared against the baseline file when it exists and any case
+slower or hungrier than the baseline by more than the tolerance is flagged.
+Slowdowns under `--min-time` seconds are timer noise and are not flagged.
+`--save-baseline` stores the current results as the new baseline.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from generation import (
+    clear_maze,
+    ellerMazeGeneration,
+    generateLabyrinth,
+    mergeMazeGeneration,
+    primMazeGeneration,
+    recursiveBacktrackerGeneration,
+    unionFindMazeGeneration,
+)
+from headless import NullMazeEffect, generate_maze
+from packed_maze import PackedMaze
+from solver import (
+    AStar,
+    BFS,
+    BidirectionalBFS,
+    DFS,
+    VectorBFS,
+    compute_shortest_path,
+    np,
+)
+
+DEFAULT_SIZES = [11, 51, 101, 251, 501, 1001, 2001]
+DEFAULT_BASELINE = "benchmark_baseline.json"
+SEED = 1234
+CHANCE = 0.1
+# Timed runs of every case, the fastest one is reported
+DEFAULT_REPEATS = 3
+# Slowdowns below this many seconds are timer noise, never regressions
+DEFAULT_MIN_TIME = 0.001
+
+
+class RecordingMazeEffect:
+    """Active hooks: records the step reports the way SolverMenuFrame does.
+
+    Cell changes are grouped into frames every `save_interval` steps and each
+    frame is applied to a render copy of the maze, like MazeWidget does before
+    drawing. Nothing is printed, so this measures the cost of the event path
+    without depending on a terminal.
+    """
+
+    def __init__(self, maze, save_interval=1):
+        self.render_maze = maze.copy()
+        self.save_interval = save_interval
+        self.pending_changes = []
+        self.steps = 0
+        self.frames = 0
+
+    def update_maze(
+        self, maze, randomColor=False, shortestPath=[], queue_size=0, changes=()
+    ):
+        self.pending_changes.extend(changes)
+        self.steps += 1
+        if self.steps % self.save_interval == 0:
+            self.flush_changes()
+
+    def flush_changes(self):
+        self.render_maze.apply(self.pending_changes)
+        self.pending_changes = []
+        self.frames += 1
+
+
+def make_effect(hooks, maze):
+    if hooks == "active":
+        return RecordingMazeEffect(maze)
+    return NullMazeEffect()
+
+
+def bench_merge_generation(size, hooks):
+    maze = generateLabyrinth(size, size)
+    mergeMazeGeneration(maze, size, size, make_effect(hooks, maze), chance=CHANCE)
+
+
+def bench_union_find_generation(size, hooks):
+    maze = generateLabyrinth(size, size)
+    unionFindMazeGeneration(maze, size, size, make_effect(hooks, maze), chance=CHANCE)
+
+
+def bench_backtracker_generation(size, hooks):
+    maze = generateLabyrinth(size, size)
+    recursiveBacktrackerGeneration(
+        maze, size, size, make_effect(hooks, maze), chance=CHANCE
+    )
+
+
+def bench_prim_generation(size, hooks):
+    maze = generateLabyrinth(size, size)
+    primMazeGeneration(maze, size, size, make_effect(hooks, maze), chance=CHANCE)
+
+
+def bench_eller_generation(size, hooks):
+    maze = generateLabyrinth(size, size)
+    ellerMazeGeneration(maze, size, size, make_effect(hooks, maze), chance=CHANCE)
+
+
+def bench_bfs(maze, start, goal, hooks):
+    return BFS(maze, make_effect(hooks, maze), start)
+
+
+def bench_dfs(maze, start, goal, hooks):
+    return DFS(maze, make_effect(hooks, maze), start)
+
+
+def bench_astar(maze, start, goal, hooks):
+    return AStar(maze, make_effect(hooks, maze), start, goal)
+
+
+def bench_bidirectional_bfs(maze, start, goal, hooks):
+    return BidirectionalBFS(maze, make_effect(hooks, maze), start, goal)
+
+
+def bench_vector_bfs(maze, start, goal, hooks):
+    return VectorBFS(maze, make_effect(hooks, maze), start)
+
+
+def bench_packed_bfs(maze, start, goal, hooks):
+    # No visualization hooks, open wall positions are rounded to a nearby cell
+    packed = PackedMaze.from_grid(maze)
+    parents, expanded = packed.bfs(
+        packed.cell(start[0] // 2, start[1] // 2),
+        packed.cell(goal[0] // 2, goal[1] // 2),
+    )
+    return expanded
+
+
+def bench_shortest_path(maze, start, goal, hooks):
+    return len(compute_shortest_path(maze, goal, make_effect(hooks, maze)))
+
+
+# name: (function, largest size it is run on)
+GENERATORS = {
+    # The original engine still scans the whole label plane on every merge
+    "merge_generation": (bench_merge_generation, 101),
+    "union_find_generation": (bench_union_find_generation, None),
+    "backtracker_generation": (bench_backtracker_generation, None),
+    "prim_generation": (bench_prim_generation, None),
+    "eller_generation": (bench_eller_generation, None),
+}
+
+# name: (function, setup run on the solved maze before the measure or None)
+SOLVERS = {
+    "bfs": (bench_bfs, None),
+    "dfs": (bench_dfs, None),
+    "astar": (bench_astar, None),
+    "bidirectional_bfs": (bench_bidirectional_bfs, None),
+    "packed_bfs": (bench_packed_bfs, None),
+    "shortest_path": (
+        bench_shortest_path,
+        lambda maze, start: BFS(maze, NullMazeEffect(), start),
+    ),
+}
+# The vectorized engine is only available when numpy is installed
+if np is not None:
+    SOLVERS["vector_bfs"] = (bench_vector_bfs, None)
+
+
+def measure(function, memory=True, repeats=DEFAULT_REPEATS):
+    """Time `repeats` runs of `function`, then one under tracemalloc for the peak.
+
+    Every run starts from the same random state, the best time is returned.
+    """
+    state = random.getstate()
+    elapsed = None
+    for _ in range(max(1, repeats)):
+        random.setstate(state)
+        started = time.perf_counter()
+        result = function()
+        run_time = time.perf_counter() - started
+        if elapsed is None or run_time < elapsed:
+            elapsed = run_time
+
+    peak = None
+    if memory:
+        random.setstate(state)
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run_benchmarks(
+    sizes, hooks_modes=("stub", "active"), memory=True, repeats=DEFAULT_REPEATS
+):
+    """Yield one result dict per (engine, size, hooks) case."""
+    for size in sizes:
+        for name, (function, max_size) in GENERATORS.items():
+            if max_size is not None and size > max_size:
+                continue
+            for hooks in hooks_modes:
+                random.seed(SEED)
+                # Generators expand no cells, the field is left empty
+                _, elapsed, peak = measure(
+                    lambda: function(size, hooks), memory, repeats
+                )
+                yield result_entry(name, size, hooks, elapsed, peak, None)
+
+        random.seed(SEED)
+        maze, start, goal = generate_maze(size, size, chance=CHANCE)
+        for name, (function, setup) in SOLVERS.items():
+            for hooks in hooks_modes:
+
+                def run():
+                    # Every run starts from the same unsolved maze
+                    solved = maze.copy()
+                    clear_maze(solved)
+                    if setup is not None:
+                        setup(solved, start)
+                    return function(solved, start, goal, hooks)
+
+                expanded, elapsed, peak = measure(run, memory, repeats)
+                yield result_entry(name, size, hooks, elapsed, peak, expanded)
+
+
+def result_entry(engine, size, hooks, elapsed, peak, expanded):
+    return {
+        "case": f"{engine}:{size}x{size}:{hooks}",
+        "engine": engine,
+        "size": size,
+        "hooks": hooks,
+        "time": elapsed,
+        "peak_memory": peak,
+        "cells_expanded": expanded,
+    }
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, "w") as f:
+        json.dump({result["case"]: result for result in results}, f, indent=2)
+
+
+def find_regressions(result, baseline, tolerance, min_time=DEFAULT_MIN_TIME):
+    """List the metrics of `result` that exceed the baseline by more than tolerance.
+
+    A time is only flagged when it is also slower by more than `min_time` seconds.
+    """
+    reference = baseline.get(result["case"])
+    if reference is None:
+        return []
+    regressions = []
+    for metric in ("time", "peak_memory"):
+        current, previous = result.get(metric), reference.get(metric)
+        if current is None or not previous:
+            continue
+        if metric == "time" and current - previous <= min_time:
+            continue
+        if current > previous * (1 + tolerance):
+            regressions.append(f"{metric} {previous:.6g} -> {current:.6g}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the maze generation and solver engines."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--hooks",
+        choices=["stub", "active", "both"],
+        default="both",
+        help="run with the visualization hooks stubbed out, active, or both",
+    )
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store the results as the new baseline",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed relative slowdown before a case is flagged",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=DEFAULT_MIN_TIME,
+        help="slowdowns shorter than this many seconds are never flagged",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=DEFAULT_REPEATS,
+        help="timed runs of every case, the fastest one is kept",
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="skip the tracemalloc run, only measure time",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    hooks_modes = ("stub", "active") if args.hooks == "both" else (args.hooks,)
+    baseline = load_baseline(args.baseline)
+
+    results = []
+    regressed = False
+    cases = run_benchmarks(args.sizes, hooks_modes, not args.no_memory, args.repeats)
+    for result in cases:
+        regressions = find_regressions(result, baseline, args.tolerance, args.min_time)
+        result["regressions"] = regressions
+        regressed = regressed or bool(regressions)
+        results.append(result)
+        print(json.dumps(result), flush=True)
+        if regressions:
+            print(
+                f"REGRESSION {result['case']}: {', '.join(regressions)}",
+                file=sys.stderr,
+            )
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+    return 1 if regressed and not args.save_baseline else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,14 +1,12 @@
-from asciimatics.screen import Screen
-from solver import BFS
 import sys
-from time import sleep
-from display import printLabyrinth
+
+from headless import format_maze, solve_maze
+from maze_file import open_maze
 
 
 def readLabyrinthFromFile(filename="labyrinth.txt"):
-    with open(filename, "r") as f:
-        lab = [list(line.strip()) for line in f.readlines()]
-    return lab
+    """Load a text or binary (.maze) labyrinth file."""
+    return open_maze(filename)[0]
 
 
 def convertStringToPosition(position_str):
@@ -18,21 +16,17 @@ def convertStringToPosition(position_str):
     return [x, y]
 
 
-def runBFS(screen):
-    lab = readLabyrinthFromFile()
-    start = sys.argv[1]
-    start = convertStringToPosition(start)
-
-    BFS(screen, lab, start)
+def runBFS():
+    # The start and goal come from the file unless a start is given
+    filename = sys.argv[2] if len(sys.argv) > 2 else "labyrinth.txt"
+    lab, start, goal = open_maze(filename)
+    if len(sys.argv) > 1 and sys.argv[1]:
+        start = convertStringToPosition(sys.argv[1])
 
-    while True:
-        if screen.has_resized():
-            screen.clear()
-            screen.refresh()
-            printLabyrinth(screen, lab)
-            sleep(0.1)
+    path, expanded = solve_maze(lab, start, goal, solver="bfs")
+    print(format_maze(lab))
+    print(f"Path length: {len(path) - 1}, cells expanded: {expanded}")
 
 
 if __name__ == "__main__":
-    input("Press Enter to start the simulation...")
-    Screen.wrapper(runBFS)
+    runBFS()
@@ -0,0 +1,189 @@
+"""LRU cache of BFS distance fields, answering repeated path queries on a maze.
+
+A distance field is the BFS distance of every cell to one source cell, with
+the direction of the parent of each cell towards the source. Once the field of
+a source is known, the shortest path between the source and any other cell is
+a walk along the parents, so queries from the same start, or to the same goal,
+no longer search the maze.
+
+The fields only depend on the walls. The cache remembers the version of the
+maze it was filled on: when the maze was edited since, the walls are compared
+and all the fields are dropped if they changed. Moving the start and the goal
+or the labels of a search do not invalidate it.
+
+Fields take 5 bytes per cell, the least recently used ones are evicted to stay
+under `max_bytes`.
+"""
+
+import weakref
+from array import array
+from collections import OrderedDict, deque
+
+from maze_constants import NO_DIRECTION, OPPOSITE_DIRECTIONS
+from solver import direction_offsets, follow_parents, get_open_neighbor_directions
+from step_runner import run_steps
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Cells expanded between two yields of field_steps
+FIELD_STEP_CELLS = 4096
+
+
+class DistanceField:
+    """BFS distances to `source`, -1 on unreachable cells, and parent directions."""
+
+    def __init__(self, source, distances, parents):
+        self.source = source
+        self.distances = distances
+        self.parents = parents
+
+    @property
+    def nbytes(self):
+        return len(self.distances) * self.distances.itemsize + len(self.parents)
+
+    def chain(self, maze, index):
+        """Flat indexes of the shortest path from `index` to the source."""
+        if self.distances[index] < 0:
+            raise Exception("No solution")
+        return follow_parents(maze, self.parents, index)
+
+
+def distance_field_steps(maze, source, step_cells=FIELD_STEP_CELLS):
+    """BFS from the flat index `source` over the cells that are not walls.
+
+    Does not change the maze. Yields every `step_cells` cells expanded, so a
+    large field can be computed from the screen loop, returns the DistanceField.
+    """
+    size = len(maze.kinds)
+    distances = array("i", [-1]) * size
+    parents = bytearray(size)
+    distances[source] = 0
+    queue = deque([source])
+    expanded = 0
+
+    while queue:
+        index = queue.popleft()
+        distance = distances[index] + 1
+        for direction, neighbor in get_open_neighbor_directions(maze, index):
+            if distances[neighbor] < 0:
+                distances[neighbor] = distance
+                parents[neighbor] = OPPOSITE_DIRECTIONS[direction]
+                queue.append(neighbor)
+        expanded += 1
+        if expanded % step_cells == 0:
+            yield
+
+    return DistanceField(source, distances, parents)
+
+
+class DistanceCache:
+    """Distance fields of the sources queried last on one maze, least recent first.
+
+    The cache follows a single maze, querying another one empties it.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.fields = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._maze = None
+        self._version = None
+        self._walls = None
+
+    def clear(self):
+        self.fields.clear()
+        self.nbytes = 0
+
+    def _check(self, maze):
+        """Drop the fields when `maze` is not the cached maze or its walls changed."""
+        if self._maze is not None and self._maze() is maze:
+            if maze.version == self._version:
+                return
+            walls = maze.walls()
+            if walls != self._walls:
+                self.clear()
+        else:
+            self.clear()
+            self._maze = weakref.ref(maze)
+            walls = maze.walls()
+        self._version = maze.version
+        self._walls = walls
+
+    def _store(self, field):
+        self.fields[field.source] = field
+        self.nbytes += field.nbytes
+        # A field larger than the whole cache is returned but not kept
+        while self.nbytes > self.max_bytes:
+            _, evicted = self.fields.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def lookup(self, maze, source):
+        """Return the cached field of the flat index `source`, or None."""
+        self._check(maze)
+        field = self.fields.get(source)
+        if field is not None:
+            self.fields.move_to_end(source)
+        return field
+
+    def field_steps(self, maze, source):
+        """Step generator returning the field of `source`, computed on a miss."""
+        field = self.lookup(maze, source)
+        if field is not None:
+            self.hits += 1
+            return field
+        self.misses += 1
+        field = yield from distance_field_steps(maze, source)
+        # The maze can not change between the steps of a search, but check it
+        self._check(maze)
+        self._store(field)
+        return field
+
+    def field(self, maze, source):
+        return run_steps(self.field_steps(maze, source))
+
+    def chain(self, maze, start, goal):
+        """Flat indexes of a shortest path from the goal to the start.
+
+        Uses the field of the start or of the goal when one is cached, the
+        field of the start is computed otherwise.
+        """
+        start, goal = maze.index(*start), maze.index(*goal)
+        field = self.lookup(maze, goal)
+        if field is not None:
+            self.hits += 1
+            chain = field.chain(maze, start)
+            chain.reverse()
+            return chain
+        return self.field(maze, start).chain(maze, goal)
+
+    def path(self, maze, start, goal):
+        """Shortest path as a list of [x, y] from the goal to the start."""
+        return [list(maze.position(index)) for index in self.chain(maze, start, goal)]
+
+    def distance(self, maze, start, goal):
+        """Length of the shortest path between two cells, -1 when there is none."""
+        start, goal = maze.index(*start), maze.index(*goal)
+        field = self.lookup(maze, goal)
+        if field is not None:
+            self.hits += 1
+            return field.distances[start]
+        return self.field(maze, start).distances[goal]
+
+    def write_parents(self, maze, start, goal):
+        """Point the parent plane of the maze along the path, like a solver does.
+
+        shortest_path_steps can then mark the path from the goal as usual.
+        """
+        chain = self.chain(maze, start, goal)
+        directions = {
+            offset: direction
+            for direction, offset in enumerate(direction_offsets(maze))
+            if direction != NO_DIRECTION
+        }
+        parents = maze.parents
+        for index, parent in zip(chain, chain[1:]):
+            parents[index] = directions[parent - index]
+        parents[chain[-1]] = NO_DIRECTION
+        return len(chain)
@@ -1,125 +1,507 @@
-from random import randint
+from array import array
 import random
 import time
-from maze_constants import WALL, VISITED, START, GOAL, EMPTY
+from maze_constants import (
+    WALL,
+    VISITED,
+    START,
+    GOAL,
+    EMPTY,
+    KIND_EMPTY,
+    KIND_GOAL,
+    KIND_LABEL,
+    KIND_START,
+    KIND_WALL,
+)
+from maze_grid import MazeGrid
+from step_runner import run_steps
 
 
-def printStep(maze, maze_effect, randomColor=False, shortestPath=[], refresh=False):
-    """Update the maze and refresh the screen."""
-    maze_effect.update_maze(maze, randomColor=randomColor, shortestPath=shortestPath)
+def printStep(
+    maze, maze_effect, randomColor=False, shortestPath=[], refresh=False, changes=()
+):
+    """Report the (x, y, kind, label) cell changes of a step and refresh the screen."""
+    maze_effect.update_maze(
+        maze, randomColor=randomColor, shortestPath=shortestPath, changes=changes
+    )
     if refresh:
         maze_effect.maze_widget.update(0)
 
 
-# Helper functions
-def checkBounds(maze, x, y):
-    return 0 <= x < len(maze) and 0 <= y < len(maze[0])
-
-
-def getNeighbors2(x, y):
-    return [[x, y - 2], [x + 2, y], [x, y + 2], [x - 2, y]]
-
-
-def checkNotVisited(lab, x, y):
-    return lab[x][y] == WALL if checkBounds(lab, x, y) else False
-
-
 def generateLabyrinth(width, height):
-    maze = [
-        [
-            WALL if (i % 2 == 1 or j % 2 == 1) else i * height // 2 + j // 2
-            for j in range(height)
-        ]
-        for i in range(width)
-    ]
+    maze = MazeGrid(width, height)
+    for i in range(width):
+        for j in range(height):
+            if i % 2 == 1 or j % 2 == 1:
+                maze.set_kind(i, j, KIND_WALL)
+            else:
+                maze.set_label(i, j, i * height // 2 + j // 2)
     return maze
 
 
-def mergeMazeGeneration(maze, width, height, maze_effect, chance=0.1):
-    done = False
+def merge_generation_steps(maze, width, height, maze_effect, chance=0.1, rng=random):
+    """Open random walls between two cells, merging their labels, until one is left.
 
+    The label of the merged set is the smaller of the two and every cell of the
+    other set is relabeled on each merge. A wall between two cells of the same
+    set is still opened with probability `chance` to create loops.
+    """
+    kinds, labels = maze.kinds, maze.labels
+    # Label sets left to merge, the walls are never labeled by generateLabyrinth
+    sets = len({labels[i] for i, kind in enumerate(kinds) if kind != KIND_WALL})
     first_step = True
 
-    while not done:
+    while sets > 1:
         # Pick a random valid cell
         while True:
             if first_step:
                 posX, posY = (
-                    randint(0, width // 2 - 1) * 2,
-                    randint(0, height // 2 - 1) * 2,
+                    rng.randint(0, width // 2 - 1) * 2,
+                    rng.randint(0, height // 2 - 1) * 2,
                 )
                 first_step = False
             else:
                 posX, posY = (
-                    randint(0, width - 1),
-                    randint(0, height - 1),
+                    rng.randint(0, width - 1),
+                    rng.randint(0, height - 1),
                 )
-                while maze[posX][posY] == WALL:
+                while kinds[posX * height + posY] == KIND_WALL:
                     posX, posY = (
-                        randint(0, width - 1),
-                        randint(0, height - 1),
+                        rng.randint(0, width - 1),
+                        rng.randint(0, height - 1),
                     )
 
-            value = maze[posX][posY]
-            neighbors = getNeighbors2(posX, posY)
+            value = labels[posX * height + posY]
 
             # Filter valid neighboring cells
-            possibleCases = [
-                n
-                for n in neighbors
-                if checkBounds(maze, n[0], n[1])
-                and (maze[n[0]][n[1]] != value or random.random() <= chance)
-                and maze[n[0]][n[1]] != WALL
-            ]
+            possibleCases = []
+            for nextX, nextY in (
+                (posX, posY - 2),
+                (posX + 2, posY),
+                (posX, posY + 2),
+                (posX - 2, posY),
+            ):
+                if not (0 <= nextX < width and 0 <= nextY < height):
+                    continue
+                index = nextX * height + nextY
+                if kinds[index] == KIND_WALL:
+                    continue
+                if labels[index] != value or rng.random() <= chance:
+                    possibleCases.append((nextX, nextY))
             if possibleCases:
                 break
 
         # Choose a random neighboring cell
-        nextCase = possibleCases[randint(0, len(possibleCases) - 1)]
-        nextX, nextY = nextCase
+        nextX, nextY = possibleCases[rng.randint(0, len(possibleCases) - 1)]
         wallX, wallY = (posX + nextX) // 2, (posY + nextY) // 2
 
         # Merge cells and update the maze
-        newValue = min(maze[posX][posY], maze[nextX][nextY])
-        oldValue = max(maze[posX][posY], maze[nextX][nextY])
+        nextValue = labels[nextX * height + nextY]
+        newValue, oldValue = min(value, nextValue), max(value, nextValue)
 
-        for i in range(width):
-            for j in range(height):
-                if maze[i][j] == oldValue:
-                    maze[i][j] = newValue
+        changes = []
+        if oldValue != newValue:
+            sets -= 1
+            # Scan the label plane in C, walls carrying the same label are skipped
+            index = -1
+            try:
+                while True:
+                    index = labels.index(oldValue, index + 1)
+                    if kinds[index] != KIND_WALL:
+                        x, y = divmod(index, height)
+                        changes.append((x, y, KIND_LABEL, newValue))
+            except ValueError:
+                pass
 
         # Update the wall between the two cells
-        maze[wallX][wallY] = newValue
+        changes.append((wallX, wallY, KIND_LABEL, newValue))
+        maze.apply(changes)
 
         # Update the maze and render the step (with random color effect)
-        printStep(maze, maze_effect, randomColor=True)
+        printStep(maze, maze_effect, randomColor=True, changes=changes)
+        yield
+
+
+def mergeMazeGeneration(maze, width, height, maze_effect, chance=0.1, rng=random):
+    """Run merge_generation_steps to its end."""
+    run_steps(merge_generation_steps(maze, width, height, maze_effect, chance, rng))
+
+
+class DisjointSet:
+    """Disjoint-set forest with path compression and union by rank."""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+        self.rank = [0] * size
+        self.components = size
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        """Merge the sets of a and b, return the new root or None if already merged."""
+        rootA, rootB = self.find(a), self.find(b)
+        if rootA == rootB:
+            return None
+        if self.rank[rootA] < self.rank[rootB]:
+            rootA, rootB = rootB, rootA
+        self.parent[rootB] = rootA
+        if self.rank[rootA] == self.rank[rootB]:
+            self.rank[rootA] += 1
+        self.components -= 1
+        return rootA
+
+
+def getWallEdges(width, height):
+    """List every wall separating two cells as (wallX, wallY, cellA, cellB)."""
+    cellsY = (height + 1) // 2
+    edges = []
+    for i in range(0, width, 2):
+        for j in range(0, height, 2):
+            cell = (i // 2) * cellsY + j // 2
+            if i + 2 < width:
+                edges.append((i + 1, j, cell, cell + cellsY))
+            if j + 2 < height:
+                edges.append((i, j + 1, cell, cell + 1))
+    return edges
+
+
+def union_find_generation_steps(
+    maze, width, height, maze_effect, chance=0.1, rng=random
+):
+    """Merge generation backed by a disjoint-set instead of full-grid relabeling.
+
+    Candidate walls are drawn from a shuffled edge list and the generation stops
+    as soon as a single component is left. A wall between two cells of the same
+    set is still opened with probability `chance` to create loops.
+    """
+    cellsY = (height + 1) // 2
+    sets = DisjointSet(((width + 1) // 2) * cellsY)
+    edges = getWallEdges(width, height)
+    rng.shuffle(edges)
+
+    for wallX, wallY, cellA, cellB in edges:
+        if sets.components <= 1:
+            break
+
+        root = sets.union(cellA, cellB)
+        if root is None:
+            if rng.random() > chance:
+                continue
+            root = sets.find(cellA)
+
+        # Label the opened wall and both cells with the set root
+        rootX, rootY = (root // cellsY) * 2, (root % cellsY) * 2
+        label = rootX * height // 2 + rootY // 2
+        changes = [
+            (wallX, wallY, KIND_LABEL, label),
+            ((cellA // cellsY) * 2, (cellA % cellsY) * 2, KIND_LABEL, label),
+            ((cellB // cellsY) * 2, (cellB % cellsY) * 2, KIND_LABEL, label),
+        ]
+        maze.apply(changes)
+
+        printStep(maze, maze_effect, randomColor=True, changes=changes)
+        yield
+
+
+def unionFindMazeGeneration(maze, width, height, maze_effect, chance=0.1, rng=random):
+    """Run union_find_generation_steps to its end."""
+    run_steps(
+        union_find_generation_steps(maze, width, height, maze_effect, chance, rng)
+    )
+
+
+def _cell_label(x, y, height):
+    """Label given to the cell (x, y) by generateLabyrinth."""
+    return x * height // 2 + y // 2
+
+
+def _carve(maze, maze_effect, wallX, wallY, cellX, cellY, label):
+    """Open a wall and the cell behind it, labeling both with `label`."""
+    changes = [
+        (wallX, wallY, KIND_LABEL, label),
+        (cellX, cellY, KIND_LABEL, label),
+    ]
+    maze.apply(changes)
+    printStep(maze, maze_effect, randomColor=True, changes=changes)
+    yield
+
+
+def _open_loops(maze, width, height, maze_effect, label, chance, rng):
+    """Open each wall still separating two cells with probability `chance`."""
+    if chance <= 0:
+        return
+    for wallX, wallY, cellA, cellB in getWallEdges(width, height):
+        if maze.is_wall(wallX, wallY) and rng.random() < chance:
+            changes = [(wallX, wallY, KIND_LABEL, label)]
+            maze.apply(changes)
+            printStep(maze, maze_effect, randomColor=True, changes=changes)
+            yield
+
 
-        # Check if all cells are merged (i.e., no different values)
-        done = all(
-            maze[i][j] in (WALL, newValue) for i in range(width) for j in range(height)
+def backtracker_generation_steps(
+    maze, width, height, maze_effect, chance=0.1, rng=random
+):
+    """Depth-first generation with an explicit stack instead of recursion.
+
+    Carves long corridors from a random cell, every carved cell takes the label
+    of the starting cell. Walls are opened afterwards with probability `chance`
+    to create loops.
+    """
+    cellsX, cellsY = (width + 1) // 2, (height + 1) // 2
+    visited = bytearray(cellsX * cellsY)
+    startX, startY = rng.randint(0, cellsX - 1), rng.randint(0, cellsY - 1)
+    label = _cell_label(startX * 2, startY * 2, height)
+    maze.set_label(startX * 2, startY * 2, label)
+    visited[startX * cellsY + startY] = 1
+    stack = [(startX, startY)]
+
+    while stack:
+        cellX, cellY = stack[-1]
+        neighbors = [
+            (nextX, nextY)
+            for nextX, nextY in (
+                (cellX, cellY - 1),
+                (cellX + 1, cellY),
+                (cellX, cellY + 1),
+                (cellX - 1, cellY),
+            )
+            if 0 <= nextX < cellsX
+            and 0 <= nextY < cellsY
+            and not visited[nextX * cellsY + nextY]
+        ]
+        if not neighbors:
+            stack.pop()
+            continue
+
+        nextX, nextY = neighbors[rng.randint(0, len(neighbors) - 1)]
+        visited[nextX * cellsY + nextY] = 1
+        yield from _carve(
+            maze,
+            maze_effect,
+            cellX + nextX,
+            cellY + nextY,
+            nextX * 2,
+            nextY * 2,
+            label,
         )
+        stack.append((nextX, nextY))
+
+    yield from _open_loops(maze, width, height, maze_effect, label, chance, rng)
+
+
+def recursiveBacktrackerGeneration(
+    maze, width, height, maze_effect, chance=0.1, rng=random
+):
+    """Run backtracker_generation_steps to its end."""
+    run_steps(
+        backtracker_generation_steps(maze, width, height, maze_effect, chance, rng)
+    )
+
+
+def prim_generation_steps(maze, width, height, maze_effect, chance=0.1, rng=random):
+    """Randomized Prim generation: grows the maze from a random frontier wall.
+
+    The frontier holds (wallX, wallY, cellX, cellY) entries, a random entry is
+    swapped with the last one and popped so each pick is O(1). Walls are opened
+    afterwards with probability `chance` to create loops.
+    """
+    cellsX, cellsY = (width + 1) // 2, (height + 1) // 2
+    visited = bytearray(cellsX * cellsY)
+    frontier = []
+
+    def add_cell(cellX, cellY):
+        visited[cellX * cellsY + cellY] = 1
+        for nextX, nextY in (
+            (cellX, cellY - 1),
+            (cellX + 1, cellY),
+            (cellX, cellY + 1),
+            (cellX - 1, cellY),
+        ):
+            if (
+                0 <= nextX < cellsX
+                and 0 <= nextY < cellsY
+                and not visited[nextX * cellsY + nextY]
+            ):
+                frontier.append((cellX + nextX, cellY + nextY, nextX, nextY))
+
+    startX, startY = rng.randint(0, cellsX - 1), rng.randint(0, cellsY - 1)
+    label = _cell_label(startX * 2, startY * 2, height)
+    maze.set_label(startX * 2, startY * 2, label)
+    add_cell(startX, startY)
+
+    while frontier:
+        pick = rng.randint(0, len(frontier) - 1)
+        frontier[pick], frontier[-1] = frontier[-1], frontier[pick]
+        wallX, wallY, cellX, cellY = frontier.pop()
+        if visited[cellX * cellsY + cellY]:
+            continue
+        yield from _carve(maze, maze_effect, wallX, wallY, cellX * 2, cellY * 2, label)
+        add_cell(cellX, cellY)
+
+    yield from _open_loops(maze, width, height, maze_effect, label, chance, rng)
+
+
+def primMazeGeneration(maze, width, height, maze_effect, chance=0.1, rng=random):
+    """Run prim_generation_steps to its end."""
+    run_steps(prim_generation_steps(maze, width, height, maze_effect, chance, rng))
+
+
+def eller_rows(width, height, chance=0.1, rng=random):
+    """Generate a maze with Eller's algorithm, yielding its rows one at a time.
+
+    Rows follow the generateLabyrinth layout: each row is a list of `height`
+    WALL/EMPTY symbols, cells sit on even rows and columns. Only the set labels
+    of the current cell row are kept, so memory does not grow with `width`.
+    Sets are merged like in mergeMazeGeneration, the smaller set taking the
+    label of the other one, and a wall between two cells of the same set is
+    opened with probability `chance` to create loops.
+    """
+    cellsX, cellsY = (width + 1) // 2, (height + 1) // 2
+    sets = [0] * cellsY
+    members = {}
+    nextLabel = 1
+
+    for cellX in range(cellsX):
+        lastRow = cellX == cellsX - 1
+
+        # Cells not connected to the previous row start their own set
+        for j in range(cellsY):
+            if not sets[j]:
+                sets[j] = nextLabel
+                members[nextLabel] = [j]
+                nextLabel += 1
+
+        # Open walls between neighboring cells, merging their sets
+        row = [EMPTY if y % 2 == 0 else WALL for y in range(height)]
+        for j in range(cellsY - 1):
+            value, nextValue = sets[j], sets[j + 1]
+            if value != nextValue:
+                if not lastRow and rng.random() < 0.5:
+                    continue
+                if len(members[value]) < len(members[nextValue]):
+                    value, nextValue = nextValue, value
+                for k in members[nextValue]:
+                    sets[k] = value
+                members[value].extend(members.pop(nextValue))
+            elif rng.random() >= chance:
+                continue
+            row[2 * j + 1] = EMPTY
+        yield row
+
+        if lastRow:
+            # An even width ends with a row of walls, like generateLabyrinth
+            if 2 * cellX + 1 < width:
+                yield [WALL] * height
+            break
+
+        # Carry every set down at least once, other cells go down half the time
+        row = [WALL] * height
+        carried = [0] * cellsY
+        nextMembers = {}
+        for value, cells in members.items():
+            down = [k for k in cells if rng.random() < 0.5]
+            if not down:
+                down = [cells[rng.randint(0, len(cells) - 1)]]
+            for k in down:
+                carried[k] = value
+                row[2 * k] = EMPTY
+            nextMembers[value] = down
+        sets, members = carried, nextMembers
+        yield row
+
+
+def write_eller_maze(filename, width, height, chance=0.1, rng=random):
+    """Stream a maze generated by eller_rows to a labyrinth file.
+
+    The file uses the first character of each symbol, one line per row, like
+    labyrinth.txt. Returns the number of rows written.
+    """
+    rows = 0
+    with open(filename, "w") as f:
+        for row in eller_rows(width, height, chance, rng):
+            # Symbols are two characters wide, keep the first one of each
+            f.write("".join(row)[::2] + "\n")
+            rows += 1
+    return rows
+
+
+def eller_generation_steps(maze, width, height, maze_effect, chance=0.1, rng=random):
+    """Fill a generateLabyrinth grid from eller_rows, reporting one step per row."""
+    for x, row in enumerate(eller_rows(width, height, chance, rng)):
+        changes = [
+            (x, y, KIND_WALL if symbol == WALL else KIND_EMPTY, 0)
+            for y, symbol in enumerate(row)
+        ]
+        maze.apply(changes)
+        printStep(maze, maze_effect, randomColor=True, changes=changes)
+        yield
+
+
+def ellerMazeGeneration(maze, width, height, maze_effect, chance=0.1, rng=random):
+    """Run eller_generation_steps to its end."""
+    run_steps(eller_generation_steps(maze, width, height, maze_effect, chance, rng))
+
+
+# name: generation function, all of them take (maze, width, height, maze_effect,
+# chance, rng) and work on a grid built by generateLabyrinth. `rng` is the
+# random module by default, a random.Random instance makes a run reproducible
+# whatever else uses the global generator
+GENERATORS = {
+    "kruskal": unionFindMazeGeneration,
+    "backtracker": recursiveBacktrackerGeneration,
+    "prim": primMazeGeneration,
+    "eller": ellerMazeGeneration,
+    "merge": mergeMazeGeneration,
+}
+# Same generations as step generators, yielding after every reported step
+GENERATION_STEPS = {
+    "kruskal": union_find_generation_steps,
+    "backtracker": backtracker_generation_steps,
+    "prim": prim_generation_steps,
+    "eller": eller_generation_steps,
+    "merge": merge_generation_steps,
+}
+DEFAULT_GENERATOR = "kruskal"
+
+
+# Translation tables mapping every kind code to its cleared kind
+_CLEAR_TABLE = bytes(
+    kind if kind in (KIND_WALL, KIND_START, KIND_GOAL) else KIND_EMPTY
+    for kind in range(256)
+)
+_CLEAR_ALL_TABLE = bytes(
+    kind if kind == KIND_WALL else KIND_EMPTY for kind in range(256)
+)
 
 
 def clear_maze(lab, clearStartAndGoal=False):
-    for row in lab:
-        for i in range(len(row)):
-            if row[i] != WALL and (clearStartAndGoal or row[i] not in (START, GOAL)):
-                row[i] = EMPTY
+    table = _CLEAR_ALL_TABLE if clearStartAndGoal else _CLEAR_TABLE
+    lab.kinds[:] = lab.kinds[:].translate(table)
+    lab.labels[:] = array("i", [0]) * len(lab.labels)
+    lab.parents[:] = bytes(len(lab.parents))
+    lab.version += 1
 
 
-def append_start_and_goal(maze, width, height):
+def append_start_and_goal(maze, width, height, rng=random):
     start, goal = None, None
 
     while not start:
-        sX, sY = randint(0, width - 1), randint(0, height - 1)
-        if maze[sX][sY] != WALL:
+        sX, sY = rng.randint(0, width - 1), rng.randint(0, height - 1)
+        if not maze.is_wall(sX, sY):
             start = [sX, sY]
-            maze[sX][sY] = START
+            maze.set(sX, sY, START)
 
     while not goal:
-        gX, gY = randint(0, width - 1), randint(0, height - 1)
-        if maze[gX][gY] != WALL and [gX, gY] != start:
+        gX, gY = rng.randint(0, width - 1), rng.randint(0, height - 1)
+        if not maze.is_wall(gX, gY) and [gX, gY] != start:
             goal = [gX, gY]
-            maze[gX][gY] = GOAL
+            maze.set(gX, gY, GOAL)
 
     return [start, goal]
@@ -0,0 +1,351 @@
+"""Headless maze generation and solving, usable without a terminal.
+
+Generates mazes and runs a solver on them without ever creating an asciimatics
+Screen, printing one JSON line per maze:
+
+    python headless.py --count 10 --width 101 --height 101 --seed 1 --solver bfs
+
+`--workers N` spreads the mazes over N processes, results are then printed as
+they complete instead of in order.
+
+`--trace FILE` records the solver steps of a single maze to FILE, see maze_trace.py
+to replay them.
+
+`--queries N` then answers N shortest path queries from the start of each maze
+to random cells. Perfect mazes (--chance 0) are indexed once by a TreeIndex,
+the other ones go through a DistanceCache, only the first query searching them.
+
+`--stream FILE` instead writes a single maze to FILE row by row with Eller's
+algorithm, without ever holding the whole maze in memory.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from distance_cache import DistanceCache
+from generation import (
+    DEFAULT_GENERATOR,
+    GENERATORS,
+    append_start_and_goal,
+    clear_maze,
+    generateLabyrinth,
+    write_eller_maze,
+)
+from maze_constants import KIND_SYMBOLS, KIND_WALL, VISITED
+from maze_trace import TraceRecorder
+from solver import (
+    AStar,
+    BFS,
+    BidirectionalBFS,
+    DFS,
+    VectorBFS,
+    compute_shortest_path,
+    np,
+)
+from tree_index import TreeIndex
+
+# Smallest maze side with room for a start and a goal on every generator
+MIN_SIZE = 3
+
+SOLVERS = {
+    "bfs": BFS,
+    "dfs": DFS,
+    "astar": AStar,
+    "bidirectional": BidirectionalBFS,
+}
+# The vectorized engine is only available when numpy is installed
+if np is not None:
+    SOLVERS["vector_bfs"] = VectorBFS
+
+
+class NullMazeEffect:
+    """Stands in for SolverMenuFrame: receives the step reports and drops them."""
+
+    def update_maze(
+        self, maze, randomColor=False, shortestPath=[], queue_size=0, changes=()
+    ):
+        pass
+
+
+def generate_maze(
+    width,
+    height,
+    maze_effect=None,
+    chance=0.1,
+    generator=DEFAULT_GENERATOR,
+    rng=random,
+):
+    """Generate a maze with a start and a goal, ready to be solved."""
+    maze_effect = maze_effect or NullMazeEffect()
+    maze = generateLabyrinth(width, height)
+    GENERATORS[generator](maze, width, height, maze_effect, chance=chance, rng=rng)
+    start, goal = append_start_and_goal(maze, width, height, rng)
+    clear_maze(maze)
+    return maze, start, goal
+
+
+def solve_maze(maze, start, goal, solver="bfs", maze_effect=None):
+    """Run a solver and rebuild the path, returns (path, cells expanded)."""
+    maze_effect = maze_effect or NullMazeEffect()
+    expanded = SOLVERS[solver](maze, maze_effect, start)
+    path = compute_shortest_path(maze, goal, maze_effect)
+    return path, expanded
+
+
+def make_jobs(
+    count,
+    width,
+    height,
+    seed=0,
+    solver="bfs",
+    chance=0.1,
+    generator=DEFAULT_GENERATOR,
+    queries=0,
+):
+    """Describe a batch as (index, seed, width, height, generator, solver, chance,
+    queries) jobs.
+
+    Maze `i` is generated with the seed `seed + i`, so any maze of a batch can
+    be reproduced on its own.
+    """
+    for index in range(count):
+        yield (index, seed + index, width, height, generator, solver, chance, queries)
+
+
+def run_queries(maze, start, count, rng):
+    """Answer `count` path queries from the start to random open cells.
+
+    Returns the stats of the queries, the time includes building the index. A
+    maze with loops is usually rejected by TreeIndex long before a full BFS.
+    """
+    cells = [index for index, kind in enumerate(maze.kinds) if kind != KIND_WALL]
+    goals = [maze.position(rng.choice(cells)) for _ in range(count)]
+    started = time.perf_counter()
+    try:
+        paths, index_name = TreeIndex(maze), "tree"
+    except ValueError:
+        paths, index_name = DistanceCache(), "distance_cache"
+    # Lengths in moves, like the distance queries
+    lengths = [len(paths.path(maze, start, goal)) - 1 for goal in goals]
+    return {
+        "queries": count,
+        "query_index": index_name,
+        "query_time": time.perf_counter() - started,
+        "mean_query_path_length": sum(lengths) / count,
+    }
+
+
+def run_job(job, trace=None):
+    """Generate and solve the maze of a job, returns its result dict.
+
+    The job gets its own random.Random seeded with the job seed, so its result
+    does not depend on the process or on the jobs run before it. The solver
+    steps are recorded to the `trace` file when one is given.
+    """
+    index, seed, width, height, generator, solver, chance, queries = job
+    rng = random.Random(seed)
+
+    started = time.perf_counter()
+    maze, start, goal = generate_maze(
+        width, height, chance=chance, generator=generator, rng=rng
+    )
+    generated = time.perf_counter()
+    if trace is None:
+        recording = nullcontext(NullMazeEffect())
+    else:
+        recording = TraceRecorder(trace, maze, heat=solver != "dfs")
+    with recording as maze_effect:
+        expanded = SOLVERS[solver](maze, maze_effect, start)
+        solved = time.perf_counter()
+        path = compute_shortest_path(maze, goal, maze_effect)
+        done = time.perf_counter()
+
+    result = {
+        "index": index,
+        "seed": seed,
+        "width": width,
+        "height": height,
+        "generator": generator,
+        "solver": solver,
+        "start": start,
+        "goal": goal,
+        "path_length": len(path) - 1,
+        "cells_expanded": expanded,
+        "generate_time": generated - started,
+        "solve_time": solved - generated,
+        "path_time": done - solved,
+    }
+    if queries:
+        result.update(run_queries(maze, start, queries, rng))
+    return result
+
+
+def run_chunk(jobs):
+    return [run_job(job) for job in jobs]
+
+
+def run_batch(
+    count,
+    width,
+    height,
+    seed=0,
+    solver="bfs",
+    chance=0.1,
+    generator=DEFAULT_GENERATOR,
+    queries=0,
+):
+    """Generate and solve `count` mazes in this process, yield one result per maze."""
+    for job in make_jobs(
+        count, width, height, seed, solver, chance, generator, queries
+    ):
+        yield run_job(job)
+
+
+def run_parallel_batch(jobs, workers=None, chunk_size=4):
+    """Run jobs over a process pool, yield the results as they complete.
+
+    Jobs are submitted in chunks of `chunk_size` to amortize the inter-process
+    overhead, with at most two chunks in flight per worker so that a long job
+    list is consumed lazily. Results come back in completion order, use their
+    "index" to sort them.
+    """
+    workers = workers or os.cpu_count() or 1
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+
+        def submit_chunk():
+            chunk = list(islice(jobs, chunk_size))
+            if chunk:
+                pending.add(executor.submit(run_chunk, chunk))
+            return bool(chunk)
+
+        for _ in range(2 * workers):
+            if not submit_chunk():
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                yield from future.result()
+                submit_chunk()
+
+
+def format_maze(maze):
+    """Render a maze as text, one line per maze row, labels are shown as visited."""
+    symbols = [symbol or VISITED for symbol in KIND_SYMBOLS]
+    return "\n".join(
+        "".join(
+            symbols[kind]
+            for kind in maze.kinds[x * maze.height : (x + 1) * maze.height]
+        )
+        for x in range(maze.width)
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=(
+            "Generate and solve mazes without a terminal, one JSON line per maze."
+        )
+    )
+    parser.add_argument("--count", type=int, default=1, help="number of mazes")
+    parser.add_argument("--width", type=int, default=35, help="maze width")
+    parser.add_argument("--height", type=int, default=35, help="maze height")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first maze")
+    parser.add_argument("--solver", choices=sorted(SOLVERS), default="bfs")
+    parser.add_argument(
+        "--generator", choices=sorted(GENERATORS), default=DEFAULT_GENERATOR
+    )
+    parser.add_argument(
+        "--chance",
+        type=float,
+        default=0.1,
+        help="probability of opening a wall that creates a loop",
+    )
+    parser.add_argument(
+        "--queries",
+        type=int,
+        default=0,
+        help="path queries answered from the start of each maze after solving it",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="number of worker processes, 0 runs the batch in this process",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=4,
+        help="mazes sent to a worker at a time",
+    )
+    parser.add_argument(
+        "--stream",
+        metavar="FILE",
+        help="write one maze to FILE with the streaming Eller generator instead",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="record the solver steps to FILE, only with --count 1",
+    )
+    args = parser.parse_args(argv)
+    if args.width < MIN_SIZE or args.height < MIN_SIZE:
+        parser.error(f"--width and --height must be at least {MIN_SIZE}")
+    if args.trace and args.count != 1:
+        parser.error("--trace records a single maze, use --count 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.stream:
+        started = time.perf_counter()
+        rows = write_eller_maze(
+            args.stream,
+            args.width,
+            args.height,
+            args.chance,
+            random.Random(args.seed),
+        )
+        result = {
+            "file": args.stream,
+            "seed": args.seed,
+            "width": args.width,
+            "height": args.height,
+            "rows": rows,
+            "generate_time": time.perf_counter() - started,
+        }
+        print(json.dumps(result), flush=True)
+        return
+    jobs = make_jobs(
+        args.count,
+        args.width,
+        args.height,
+        args.seed,
+        args.solver,
+        args.chance,
+        args.generator,
+        args.queries,
+    )
+    if args.trace:
+        results = [run_job(next(jobs), args.trace)]
+    elif args.workers:
+        results = run_parallel_batch(jobs, args.workers, args.chunk_size)
+    else:
+        results = map(run_job, jobs)
+    for result in results:
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,10 +2,15 @@ from asciimatics.scene import Scene
 from asciimatics.screen import Screen
 from asciimatics.exceptions import ResizeScreenError
 from asciimatics.exceptions import StopApplication
+import argparse
 import os
+import sys
 
 
+from metrics import METRICS
+from profiling import DEFAULT_TOP, PhaseProfiler
 from maze_input_frame import MazeInputFrame
+from maze_widget import MazeWidget
 from solver_menu_frame import SolverMenuFrame
 from maze_solver_scene import MazeSolverScene
 
@@ -15,70 +20,6 @@ def get_terminal_size():
     return os.get_terminal_size()
 
 
-# Function to check if the maze fits within the terminal
-def check_if_maze_fits(maze_width, maze_height):
-    # Get the terminal size
-    terminal_width, terminal_height = get_terminal_size()
-
-    # Leave some space for borders and other UI elements
-    available_width = terminal_width // 2
-    available_height = terminal_height - 15
-
-    # Check if the maze fits
-    if maze_width > available_width or maze_height > available_height:
-        return False, available_width, available_height
-    return True, available_width, available_height
-
-
-# Function to give zoom instructions based on the terminal
-def prompt_for_zoom(screen, maze_width, maze_height):
-    # Check if the maze fits within the terminal
-    fits, available_width, available_height = check_if_maze_fits(
-        maze_width, maze_height
-    )
-
-    while not fits:
-        terminal = get_terminal_size()
-        prompt = f"Please zoom out the terminal to fit the maze (current size: {terminal.columns}x{terminal.lines})."
-        prompt2 = f"Maze size: {maze_width}x{maze_height}"
-        prompt3 = f"Available size: {available_width}x{available_height}"
-        instructions = "Use Ctrl + - to zoom out, Ctrl + + to zoom in."
-
-        # Calculate the position to center the box
-        box_width = max(len(prompt), len(prompt2), len(prompt3), len(instructions)) + 4
-        box_height = 7
-        start_x = (terminal.columns - box_width) // 2
-        start_y = (terminal.lines - box_height) // 2
-
-        # Draw the box
-        for y in range(start_y, start_y + box_height):
-            for x in range(start_x, start_x + box_width):
-                if y in (start_y, start_y + box_height - 1) or x in (
-                    start_x,
-                    start_x + box_width - 1,
-                ):
-                    screen.print_at("█", x, y)
-                else:
-                    screen.print_at(" ", x, y)
-
-        # Print the prompts inside the box
-        screen.print_at(prompt.center(box_width - 2), start_x + 1, start_y + 1)
-        screen.print_at(prompt2.center(box_width - 2), start_x + 1, start_y + 2)
-        screen.print_at(prompt3.center(box_width - 2), start_x + 1, start_y + 3)
-        screen.print_at(instructions.center(box_width - 2), start_x + 1, start_y + 5)
-
-        # Wait for user input (Ctrl + - to zoom out, Ctrl + + to zoom in)
-        screen.refresh()
-        while True:
-            if screen.has_resized():
-                screen.clear()
-                screen.refresh()
-                break
-        fits, available_width, available_height = check_if_maze_fits(
-            maze_width, maze_height
-        )
-
-
 def Main(screen):
     # External dictionary to store width and height
     user_input = {"width": None, "height": None}
@@ -97,8 +38,7 @@ def Main(screen):
     screen.clear()
     screen.refresh()
 
-    # Prompt the user to adjust zoom if necessary
-    prompt_for_zoom(screen, sizeX, sizeY)
+    # Mazes larger than the terminal are scrolled inside the maze widget
     screen = Screen.open()
     # Validate the input
     if sizeX is None or sizeY is None:
@@ -123,14 +63,13 @@ def Main(screen):
             quit()
         except ResizeScreenError as e:
             """ ResizeScreenError is raised when the screen is resized """
-            """ Resize the screen and prompt for zoom """
+            """ Resize the screen, the maze viewport adapts to the new size """
             # Common settings for screen
             screen.clear()
             screen.refresh()
 
             scene = e.scene
             screen.set_scenes([scene])
-            prompt_for_zoom(screen, sizeX, sizeY)
 
             screen.clear()
             screen.refresh()
@@ -139,10 +78,44 @@ def Main(screen):
             continue
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate and solve mazes.")
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        default=os.environ.get("MAZE_PROFILE"),
+        help="profile the menu actions and the renderer into DIR",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        default=os.environ.get("MAZE_METRICS_FILE"),
+        help="write the counters and timings of the session to FILE at exit",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=DEFAULT_TOP,
+        help="allocation sites listed in the profiling reports",
+    )
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    profiler = None
+    if args.profile:
+        profiler = PhaseProfiler(args.profile, args.profile_top)
+        profiler.instrument(SolverMenuFrame, MazeWidget)
+    if args.metrics:
+        METRICS.dump_at_exit(args.metrics)
     try:
         Screen.wrapper(Main)
         quit()
     except KeyboardInterrupt:
-        # Clean threads still running
+        # Clean threads still running, os._exit skips the atexit handlers
+        if args.metrics:
+            METRICS.dump(args.metrics)
+        if profiler is not None:
+            profiler.close()
         os._exit(0)
@@ -1,5 +1,3 @@
-from asciimatics.screen import Screen
-
 # Labyrinth Symbols
 EMPTY = "  "
 # WALL = "##"
@@ -8,14 +6,24 @@ VISITED = "**"
 BADWAY = "XX"
 GOAL = "VV"
 START = "SS"
-# Define the colors (asciimatics uses integers for colors)
-COLOR_MAP = {
-    WALL: Screen.COLOUR_WHITE,  # WALL BROWN
-    EMPTY: Screen.COLOUR_BLACK,  # EMPTY
-    VISITED: Screen.COLOUR_CYAN,  # VISITED
-    BADWAY: Screen.COLOUR_RED,  # BADWAY
-    GOAL: Screen.COLOUR_MAGENTA,  # GOAL
-    START: Screen.COLOUR_GREEN,  # START
+
+# Cell kind codes used by the compact MazeGrid representation
+KIND_EMPTY = 0
+KIND_WALL = 1
+KIND_VISITED = 2
+KIND_BADWAY = 3
+KIND_GOAL = 4
+KIND_START = 5
+# A cell holding an integer label (set id during generation, step during solving)
+KIND_LABEL = 6
+# A cell labelled by a search running backwards from the goal
+KIND_GOAL_LABEL = 7
+
+KIND_SYMBOLS = [EMPTY, WALL, VISITED, BADWAY, GOAL, START, None, None]
+SYMBOL_KINDS = {
+    symbol: kind for kind, symbol in enumerate(KIND_SYMBOLS) if symbol is not None
 }
 
-BLACK_COLOURS = [16, *range(232, 256)]
+# Direction codes stored in the MazeGrid parent plane: 0 for none, then N, E, S, W
+NO_DIRECTION, NORTH, EAST, SOUTH, WEST = range(5)
+OPPOSITE_DIRECTIONS = (NO_DIRECTION, SOUTH, WEST, NORTH, EAST)
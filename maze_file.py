@@ -0,0 +1,154 @@
+"""Binary and text maze files.
+
+The binary format is a fixed header followed by the kinds plane of a MazeGrid,
+one KIND_* byte per cell in `x * height + y` order:
+
+    magic      4 bytes  b"MAZB"
+    version    uint16
+    width      uint32
+    height     uint32
+    start      2 x int32 (x, y), -1 when the maze has no start
+    goal       2 x int32 (x, y), -1 when the maze has no goal
+    body       uint32 offset of the cell body from the start of the file
+
+All integers are little-endian. The body is aligned on the mmap allocation
+granularity so `load_maze` maps it directly as the kinds plane of the grid:
+nothing is parsed and only the pages a solver writes to are copied in memory,
+the file itself is never modified. Labels and parents are not stored.
+
+The text format is the labyrinth.txt one, one line per row and one character
+per cell (the first character of each symbol), `symbol_width=2` reads and
+writes the full symbols instead, like `headless.format_maze`.
+
+    python maze_file.py labyrinth.txt labyrinth.maze
+"""
+
+import mmap
+import struct
+import sys
+
+from maze_constants import (
+    KIND_GOAL,
+    KIND_START,
+    KIND_SYMBOLS,
+    SYMBOL_KINDS,
+    VISITED,
+)
+from maze_grid import MazeGrid
+
+MAGIC = b"MAZB"
+VERSION = 1
+HEADER = struct.Struct("<4sHII4iI")
+BINARY_EXTENSION = ".maze"
+
+
+def _find_kind(maze, kind):
+    index = maze.kinds.find(bytes((kind,)))
+    return None if index < 0 else list(maze.position(index))
+
+
+def save_maze(maze, filename, start=None, goal=None):
+    """Write `maze` in the binary format, start and goal default to their cells."""
+    start = start or _find_kind(maze, KIND_START) or [-1, -1]
+    goal = goal or _find_kind(maze, KIND_GOAL) or [-1, -1]
+    body = max(mmap.ALLOCATIONGRANULARITY, HEADER.size)
+    header = HEADER.pack(MAGIC, VERSION, maze.width, maze.height, *start, *goal, body)
+    with open(filename, "wb") as f:
+        f.write(header.ljust(body, b"\0"))
+        f.write(maze.kinds)
+
+
+def read_header(f):
+    """Read and check the header of an open binary maze file."""
+    data = f.read(HEADER.size)
+    if len(data) < HEADER.size or data[:4] != MAGIC:
+        raise ValueError(f"{f.name} is not a binary maze file")
+    magic, version, width, height, sX, sY, gX, gY, body = HEADER.unpack(data)
+    if version != VERSION:
+        raise ValueError(f"Unsupported maze file version {version}")
+    start = [sX, sY] if sX >= 0 else None
+    goal = [gX, gY] if gX >= 0 else None
+    return width, height, start, goal, body
+
+
+def load_maze(filename):
+    """Load a binary maze file, returns (maze, start, goal).
+
+    The kinds plane is a copy-on-write mmap of the file body. When the body
+    offset does not fit the mmap granularity of this platform, the body is read
+    into memory instead.
+    """
+    with open(filename, "rb") as f:
+        width, height, start, goal, body = read_header(f)
+        size = width * height
+        if size and body % mmap.ALLOCATIONGRANULARITY == 0:
+            kinds = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_COPY, offset=body)
+        else:
+            f.seek(body)
+            kinds = bytearray(f.read(size))
+        if len(kinds) != size:
+            raise ValueError(f"{filename} is truncated")
+    return MazeGrid(width, height, kinds), start, goal
+
+
+def _text_table():
+    # Unknown characters map to 255, which is not a kind code
+    table = bytearray(b"\xff" * 256)
+    for symbol, kind in SYMBOL_KINDS.items():
+        table[ord(symbol[0])] = kind
+    return bytes(table)
+
+
+def read_text_maze(filename, symbol_width=1):
+    """Read a text maze, one line per row, returns (maze, start, goal)."""
+    with open(filename, "rb") as f:
+        rows = [line.rstrip(b"\r\n")[::symbol_width] for line in f]
+    while rows and not rows[-1]:
+        rows.pop()
+    if not rows or any(len(row) != len(rows[0]) for row in rows):
+        raise ValueError(f"{filename} rows must all have the same length")
+
+    kinds = bytearray(b"".join(rows).translate(_text_table()))
+    if 255 in kinds:
+        raise ValueError(f"{filename} contains an unknown symbol")
+    maze = MazeGrid(len(rows), len(rows[0]), kinds)
+    return maze, _find_kind(maze, KIND_START), _find_kind(maze, KIND_GOAL)
+
+
+def write_text_maze(maze, filename, symbol_width=1):
+    """Write a text maze, labels are written as visited cells like format_maze."""
+    symbols = [(symbol or VISITED)[:symbol_width] for symbol in KIND_SYMBOLS]
+    with open(filename, "w") as f:
+        for x in range(maze.width):
+            row = maze.kinds[x * maze.height : (x + 1) * maze.height]
+            f.write("".join(symbols[kind] for kind in row) + "\n")
+
+
+def is_binary_maze(filename):
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def open_maze(filename):
+    """Load a binary or text maze file, returns (maze, start, goal)."""
+    if is_binary_maze(filename):
+        return load_maze(filename)
+    return read_text_maze(filename)
+
+
+def main(argv):
+    """Convert a maze file, the output format is picked from its extension."""
+    if len(argv) != 2:
+        print("usage: python maze_file.py INPUT OUTPUT", file=sys.stderr)
+        return 2
+    source, target = argv
+    maze, start, goal = open_maze(source)
+    if target.endswith(BINARY_EXTENSION):
+        save_maze(maze, target, start, goal)
+    else:
+        write_text_maze(maze, target)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,150 @@
+from array import array
+
+from maze_constants import (
+    KIND_GOAL_LABEL,
+    KIND_LABEL,
+    KIND_SYMBOLS,
+    KIND_WALL,
+    SYMBOL_KINDS,
+)
+
+# Maps the kind plane to 1 on walls and 0 elsewhere
+WALL_TABLE = bytes(int(kind == KIND_WALL) for kind in range(256))
+
+
+class MazeGrid:
+    """Compact maze storage shared by the generators, the solvers and the widget.
+
+    Cells are stored in flat planes indexed by `x * height + y`:
+    - `kinds`: one byte per cell holding a KIND_* code from maze_constants
+    - `labels`: one int32 per cell holding the set id or step of KIND_LABEL cells
+    - `parents`: one byte per cell holding the direction code towards the cell
+      a solver reached it from (NO_DIRECTION for the start and unreached cells)
+
+    `maze[x][y]` still works and returns the legacy value (a symbol string or an
+    int label), but hot loops should use the planes directly.
+
+    `version` is incremented by every edit made through the methods below, so
+    caches of derived data can tell when the maze changed. The solvers write
+    their labels and parents to the planes directly, which is not an edit.
+    """
+
+    def __init__(self, width, height, kinds=None, labels=None, parents=None):
+        self.width = width
+        self.height = height
+        size = width * height
+        self.kinds = kinds if kinds is not None else bytearray(size)
+        self.labels = labels if labels is not None else array("i", [0]) * size
+        self.parents = parents if parents is not None else bytearray(size)
+        self.version = 0
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a grid from a list of lists of symbols and int labels."""
+        grid = cls(len(rows), len(rows[0]))
+        for x, row in enumerate(rows):
+            for y, value in enumerate(row):
+                grid.set(x, y, value)
+        return grid
+
+    def copy(self):
+        return MazeGrid(
+            self.width,
+            self.height,
+            bytearray(self.kinds),
+            array("i", self.labels),
+            bytearray(self.parents),
+        )
+
+    def index(self, x, y):
+        return x * self.height + y
+
+    def position(self, index):
+        return divmod(index, self.height)
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def kind(self, x, y):
+        return self.kinds[x * self.height + y]
+
+    def label(self, x, y):
+        return self.labels[x * self.height + y]
+
+    def set_kind(self, x, y, kind):
+        self.kinds[x * self.height + y] = kind
+        self.version += 1
+
+    def set_label(self, x, y, label):
+        index = x * self.height + y
+        self.kinds[index] = KIND_LABEL
+        self.labels[index] = label
+        self.version += 1
+
+    def get(self, x, y):
+        """Return the legacy value of a cell: its symbol, or its label."""
+        index = x * self.height + y
+        kind = self.kinds[index]
+        if kind == KIND_LABEL or kind == KIND_GOAL_LABEL:
+            return self.labels[index]
+        return KIND_SYMBOLS[kind]
+
+    def set(self, x, y, value):
+        """Set a cell from a legacy value: a symbol or an int label."""
+        if isinstance(value, int):
+            self.set_label(x, y, value)
+        else:
+            index = x * self.height + y
+            self.kinds[index] = SYMBOL_KINDS[value]
+            self.labels[index] = 0
+            self.version += 1
+
+    def apply(self, changes):
+        """Apply a sequence of (x, y, kind, label) cell-change events."""
+        kinds, labels, height = self.kinds, self.labels, self.height
+        for x, y, kind, label in changes:
+            index = x * height + y
+            kinds[index] = kind
+            labels[index] = label
+        self.version += 1
+
+    def is_wall(self, x, y):
+        return self.kinds[x * self.height + y] == KIND_WALL
+
+    def walls(self):
+        """Return the wall mask of the maze, 1 on walls and 0 elsewhere."""
+        return bytes(self.kinds).translate(WALL_TABLE)
+
+    def __len__(self):
+        return self.width
+
+    def __getitem__(self, x):
+        if not 0 <= x < self.width:
+            raise IndexError("maze row out of range")
+        return _GridRow(self, x)
+
+
+class _GridRow:
+    """Row proxy so that `maze[x][y]` keeps working on a MazeGrid."""
+
+    __slots__ = ("_grid", "_x")
+
+    def __init__(self, grid, x):
+        self._grid = grid
+        self._x = x
+
+    def __len__(self):
+        return self._grid.height
+
+    def __getitem__(self, y):
+        if not 0 <= y < self._grid.height:
+            raise IndexError("maze column out of range")
+        return self._grid.get(self._x, y)
+
+    def __setitem__(self, y, value):
+        if not 0 <= y < self._grid.height:
+            raise IndexError("maze column out of range")
+        self._grid.set(self._x, y, value)
+
+    def __iter__(self):
+        return (self._grid.get(self._x, y) for y in range(self._grid.height))
@@ -0,0 +1,282 @@
+"""Trace files of solver runs, recorded from the step reports and replayed later.
+
+A trace is a header followed by zlib-compressed blocks and an index:
+
+    header     b"MZTR", version, width, height, keyframe interval, flags
+    blocks     keyframe (kinds and labels planes) then up to `interval` steps
+    index      (offset, length, steps) of every block
+    footer     offset of the index and number of blocks
+
+Each step is a flags byte, a change count and its (x, y, kind, label) changes.
+Steps without changes are not recorded. Seeking to a step decodes a single
+block: its keyframe is copied and the steps before the target are applied, so
+a replay can jump anywhere or go backwards without running the solver again.
+
+    python maze_trace.py /tmp/maze_last_run.trace --step 120
+"""
+
+import argparse
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from maze_grid import MazeGrid
+
+MAGIC = b"MZTR"
+VERSION = 1
+HEADER = struct.Struct("<4sHIIIB")
+FOOTER = struct.Struct("<QI")
+INDEX_ENTRY = struct.Struct("<QII")
+STEP = struct.Struct("<BI")
+CHANGE = struct.Struct("<IIBi")
+
+# Header flags
+HEAT_COLOURS = 1
+# Step flags
+RANDOM_COLOUR = 1
+
+DEFAULT_KEYFRAME_INTERVAL = 1000
+
+
+class TraceRecorder:
+    """Maze effect writing every step report to a trace file.
+
+    The reports are forwarded to `maze_effect` when one is given, so recording
+    can wrap the SolverMenuFrame as well as run headless. `heat` records that
+    the labels are BFS distances, for the replay colours.
+    """
+
+    def __init__(
+        self,
+        filename,
+        maze,
+        maze_effect=None,
+        keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+        heat=False,
+        level=6,
+    ):
+        self.maze = maze
+        self.maze_effect = maze_effect
+        self.maze_widget = getattr(maze_effect, "maze_widget", None)
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+        self.steps = 0
+        self._index = []
+        self._file = open(filename, "wb")
+        self._file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                maze.width,
+                maze.height,
+                keyframe_interval,
+                HEAT_COLOURS if heat else 0,
+            )
+        )
+        self._start_block()
+
+    def _start_block(self):
+        self._compressor = zlib.compressobj(self.level)
+        self._block_steps = 0
+        self._block_data = [
+            self._compressor.compress(self.maze.kinds),
+            self._compressor.compress(self.maze.labels.tobytes()),
+        ]
+
+    def _finish_block(self):
+        self._block_data.append(self._compressor.flush())
+        data = b"".join(self._block_data)
+        self._index.append((self._file.tell(), len(data), self._block_steps))
+        self._file.write(data)
+
+    def update_maze(
+        self, maze, randomColor=False, shortestPath=[], queue_size=0, changes=()
+    ):
+        if changes:
+            self.record_step(changes, RANDOM_COLOUR if randomColor else 0)
+        if self.maze_effect is not None:
+            self.maze_effect.update_maze(
+                maze,
+                randomColor=randomColor,
+                shortestPath=shortestPath,
+                queue_size=queue_size,
+                changes=changes,
+            )
+
+    def record_step(self, changes, flags=0):
+        data = STEP.pack(flags, len(changes)) + b"".join(
+            CHANGE.pack(*change) for change in changes
+        )
+        self._block_data.append(self._compressor.compress(data))
+        self._block_steps += 1
+        self.steps += 1
+        # The solver changes the maze before reporting the step, so the next
+        # keyframe has to be taken now, before its next step
+        if self._block_steps == self.keyframe_interval:
+            self._finish_block()
+            self._start_block()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._finish_block()
+        index_offset = self._file.tell()
+        for entry in self._index:
+            self._file.write(INDEX_ENTRY.pack(*entry))
+        self._file.write(FOOTER.pack(index_offset, len(self._index)))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TraceReader:
+    """Random access to the steps of a trace file, one decoded block cached."""
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            magic, version, width, height, interval, flags = HEADER.unpack(
+                f.read(HEADER.size)
+            )
+            if magic != MAGIC:
+                raise ValueError(f"{filename} is not a trace file")
+            if version != VERSION:
+                raise ValueError(f"Unsupported trace version {version}")
+            f.seek(-FOOTER.size, os.SEEK_END)
+            index_offset, blocks = FOOTER.unpack(f.read(FOOTER.size))
+            f.seek(index_offset)
+            self.index = [
+                INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size)) for _ in range(blocks)
+            ]
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.keyframe_interval = interval
+        self.heat = bool(flags & HEAT_COLOURS)
+        self.steps = sum(steps for _, _, steps in self.index)
+        self._block = None
+        self._block_number = None
+
+    def _load_block(self, number):
+        """Decode a block as (kinds, labels, [(flags, changes), ...])."""
+        if number != self._block_number:
+            offset, length, steps = self.index[number]
+            with open(self.filename, "rb") as f:
+                f.seek(offset)
+                data = zlib.decompress(f.read(length))
+            size = self.width * self.height
+            kinds = data[:size]
+            labels = array("i")
+            labels.frombytes(data[size : 5 * size])
+            position = 5 * size
+            block_steps = []
+            for _ in range(steps):
+                flags, count = STEP.unpack_from(data, position)
+                position += STEP.size
+                end = position + count * CHANGE.size
+                block_steps.append(
+                    (flags, list(CHANGE.iter_unpack(data[position:end])))
+                )
+                position = end
+            self._block = (kinds, labels, block_steps)
+            self._block_number = number
+        return self._block
+
+    def _locate(self, step):
+        # Block b holds the keyframe after step b * interval and the steps after it
+        number = step // self.keyframe_interval
+        return number, step - number * self.keyframe_interval
+
+    def step(self, step):
+        """Return (flags, changes) of a step, steps are numbered from 1."""
+        if not 1 <= step <= self.steps:
+            raise IndexError(f"Step {step} out of range 1..{self.steps}")
+        number, position = self._locate(step - 1)
+        return self._load_block(number)[2][position]
+
+    def changes(self, first, last):
+        """Concatenated changes of the steps in (first, last], for playing forward."""
+        changes = []
+        for step in range(first + 1, last + 1):
+            changes.extend(self.step(step)[1])
+        return changes
+
+    def state_at(self, step):
+        """Return a MazeGrid of the maze after `step` steps, 0 is the start."""
+        step = max(0, min(step, self.steps))
+        number, position = self._locate(step)
+        kinds, labels, block_steps = self._load_block(number)
+        maze = MazeGrid(self.width, self.height, bytearray(kinds), array("i", labels))
+        for _, changes in block_steps[:position]:
+            maze.apply(changes)
+        return maze
+
+
+class TracePlayer:
+    """Replay position over a trace: plays at any speed, forwards or backwards.
+
+    `tick` advances by `speed` steps and returns what to show, either
+    ("changes", changes, flags) when playing forward or ("keyframe", maze,
+    flags) after a seek or when playing backwards.
+    """
+
+    def __init__(self, reader, speed=1):
+        self.reader = reader
+        self.position = 0
+        self.speed = speed
+        self.paused = False
+
+    @property
+    def finished(self):
+        return self.position >= self.reader.steps and self.speed > 0
+
+    def _flags(self, step):
+        return self.reader.step(step)[0] if step > 0 else 0
+
+    def seek(self, step):
+        self.position = max(0, min(step, self.reader.steps))
+        maze = self.reader.state_at(self.position)
+        return ("keyframe", maze, self._flags(self.position))
+
+    def tick(self):
+        if self.paused:
+            return None
+        target = max(0, min(self.position + self.speed, self.reader.steps))
+        if target == self.position:
+            return None
+        if target < self.position:
+            return self.seek(target)
+        changes = self.reader.changes(self.position, target)
+        self.position = target
+        return ("changes", changes, self._flags(target))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Show a recorded maze trace.")
+    parser.add_argument("trace", help="trace file")
+    parser.add_argument(
+        "--step", type=int, help="print the maze after this step, the end by default"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from headless import format_maze
+
+    args = parse_args(argv)
+    reader = TraceReader(args.trace)
+    step = reader.steps if args.step is None else args.step
+    print(format_maze(reader.state_at(step)))
+    print(
+        f"Step {min(max(step, 0), reader.steps)}/{reader.steps}, "
+        f"{reader.width}x{reader.height}, {len(reader.index)} keyframes"
+    )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
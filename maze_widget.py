@@ -4,12 +4,42 @@ import random
 import time
 from collections import deque
 from threading import Thread
-from threading import Condition
+from threading import Condition, RLock
 
 from asciimatics.screen import Screen
 from asciimatics.widgets import Widget
 
-from maze_constants import COLOR_MAP, EMPTY, START, VISITED, WALL
+from metrics import METRICS
+from maze_constants import (
+    BADWAY,
+    EMPTY,
+    GOAL,
+    KIND_GOAL_LABEL,
+    KIND_LABEL,
+    KIND_SYMBOLS,
+    KIND_VISITED,
+    KIND_WALL,
+    START,
+    VISITED,
+    WALL,
+)
+
+# Define the colors (asciimatics uses integers for colors)
+COLOR_MAP = {
+    WALL: Screen.COLOUR_WHITE,  # WALL BROWN
+    EMPTY: Screen.COLOUR_BLACK,  # EMPTY
+    VISITED: Screen.COLOUR_CYAN,  # VISITED
+    BADWAY: Screen.COLOUR_RED,  # BADWAY
+    GOAL: Screen.COLOUR_MAGENTA,  # GOAL
+    START: Screen.COLOUR_GREEN,  # START
+}
+
+BLACK_COLOURS = [16, *range(232, 256)]
+
+# Colour of every kind code, KIND_LABEL cells are coloured separately
+KIND_COLOURS = [COLOR_MAP.get(symbol, Screen.COLOUR_BLACK) for symbol in KIND_SYMBOLS]
+# Same mapping as a bytes.translate table, to colour a whole row at once
+KIND_COLOUR_TABLE = bytes(KIND_COLOURS) + bytes(256 - len(KIND_COLOURS))
 
 
 def getFixedWidth(width, height):
@@ -82,6 +112,13 @@ def get_color_from_percentage(gradient_colors, percentage, exponent=2):
     # Normalize percentage between 0 and 1
     normalized_percentage = percentage / 100.0
 
+    return gradient_colors[
+        get_gradient_index(len(gradient_colors), normalized_percentage, exponent)
+    ]
+
+
+def get_gradient_index(steps, normalized_percentage, exponent=2):
+    """Index in a gradient of `steps` colours of a percentage between 0 and 1."""
     # Apply exponential scaling
     scaled_percentage = normalized_percentage**exponent
 
@@ -89,10 +126,7 @@ def get_color_from_percentage(gradient_colors, percentage, exponent=2):
     scaled_percentage *= 100
 
     # Map the scaled percentage to the index in the gradient
-    steps = len(gradient_colors)
-    index = int((scaled_percentage / 100) * (steps - 1))
-
-    return gradient_colors[index]
+    return int((scaled_percentage / 100) * (steps - 1))
 
 
 def print_gradient(gradient_colors):
@@ -104,6 +138,92 @@ def print_gradient(gradient_colors):
     print()  # Newline after printing the gradient
 
 
+def supports_256_colours():
+    """Check if the terminal supports 256 colors."""
+    return os.getenv("TERM") in ("xterm-256color", "tmux-256color")
+
+
+# Heat colours of the cells labelled from the start, then from the goal:
+# base colour of the 256 colour gradient and the four colours used otherwise
+START_HEAT = (
+    (255, 0, 0),
+    (
+        Screen.COLOUR_MAGENTA,
+        Screen.COLOUR_RED,
+        Screen.COLOUR_YELLOW,
+        Screen.COLOUR_CYAN,
+    ),
+)
+GOAL_HEAT = (
+    (0, 0, 255),
+    (Screen.COLOUR_BLUE, Screen.COLOUR_BLUE, Screen.COLOUR_GREEN, Screen.COLOUR_GREEN),
+)
+
+
+def build_heat_table(size, colour_256, scaled=True, heat=START_HEAT):
+    """
+    Precomputes the BFS heat colour of every step label from 0 to size.
+
+    The greater the step, the darker the colour (red by default). When `scaled`
+    is False every step gets the colour of the farthest one.
+
+    The colour only takes a few values, each over a range of consecutive steps,
+    so the ranges are found by bisection and filled at once.
+    """
+    base_color, basic_colours = heat
+    if colour_256:
+        # From brightest to darkest, index 0 is the brightest
+        colours = create_gradient(base_color)[::-1]
+    else:
+        colours = basic_colours
+
+    def colour_index(label):
+        # Never grows with the label
+        percentage = label / size if scaled else 1
+        percentage = max(0, (1 - percentage) * 100)
+
+        if colour_256:
+            return get_gradient_index(len(colours), percentage / 100.0, 4)
+        elif percentage < 10:
+            return 0
+        elif percentage < 25:
+            return 1
+        elif percentage < 66:
+            return 2
+        return 3
+
+    table = bytearray(size + 1)
+    label = 0
+    while label <= size:
+        index = colour_index(label)
+        # First label with a smaller colour index
+        low, high = label + 1, size + 1
+        while low < high:
+            middle = (low + high) // 2
+            if colour_index(middle) < index:
+                high = middle
+            else:
+                low = middle + 1
+        table[label:low] = bytes([colours[index]]) * (low - label)
+        label = low
+    return table
+
+
+def build_palette_table(size):
+    """
+    Precomputes a random-looking but stable colour for every set label from 0 to size.
+
+    Label 0 is black, the others are spread over the 6x6x6 colour cube.
+    """
+    possible_colours = range(17, 231)
+    table = bytearray(
+        possible_colours[(((label * 2654435761) & 0xFFFFFFFF) >> 16) % 214]
+        for label in range(size + 1)
+    )
+    table[0] = Screen.COLOUR_BLACK
+    return table
+
+
 class MazeWidget(Widget):
     def __init__(
         self,
@@ -120,9 +240,12 @@ class MazeWidget(Widget):
         self._maze = maze
         self._required_height = height
         self._required_width = width
+        # Colour settings of the frames pushed next, set from the UI thread
         self.random_color = randomColor
         self.BFS = BFS
         self.shortest_path = shortestPath or []
+        # Settings of the last frame applied, only used to draw
+        self.render_settings = (self.random_color, self.BFS, self.shortest_path)
 
         self.needs_update = True
         self.buffer_length = 0
@@ -141,15 +264,17 @@ class MazeWidget(Widget):
             1.1  # adjust this factor to control the level of buffer overload
         )
 
-        self.buffer_size = int(
-            (height * width) ** 0.5 / (max_fps**0.5 + 1) * overload_factor
+        self.buffer_size = max(
+            1, int((height * width) ** 0.5 / (max_fps**0.5 + 1) * overload_factor)
         )
-        self.buffer = deque(maxlen=self.buffer_size)
+        # Frames hold cell-change events, none of them can be dropped: past
+        # buffer_size the new frames are merged into the last one instead
+        self.buffer = deque()
 
         # The interval to save the maze in the buffer
         # The higher the interval, the more frames are skipped
         # Influenced by the size of the maze and the max
-        self.save_interval = (len(maze) * len(maze[0])) // (max_fps * 2)
+        self.save_interval = (maze.width * maze.height) // (max_fps * 2)
 
         if self.save_interval % self.buffer_size == 0:
             self.save_interval = 1
@@ -161,103 +286,234 @@ class MazeWidget(Widget):
 
         self.color_only = True
 
+        # Persistent render state, frames are applied to it as they are drawn
         self.last_maze = None
 
-    def dump_buffer(self):
-        """Print the last maze in the buffer"""
-        if len(self.buffer) != 0:
-            self._draw(self.buffer.pop()[0])
-            self._frame.canvas.refresh()
-            self._frame.screen.refresh()
+        # What is currently on the canvas: the maze it shows, the layout and
+        # colour settings it was drawn with and the drawn colour of each cell
+        self._drawn_maze = None
+        self._drawn_layout = None
+        self._drawn = {}
+        # Indexes of the cells changed since the last draw
+        self._dirty = set()
+
+        # Label to colour tables, built once per colour mode and maze size
+        self.colour_256 = supports_256_colours()
+        self._label_tables = {}
+
+        # Viewport over mazes larger than the canvas: top-left cell of the
+        # visible window in drawing coordinates (border included) and size
+        self.camera = [0, 0]
+        self.view_size = (0, 0)
+        # Follow the last changed cell, i.e. the solver's current cell
+        self.follow = True
+        self._focus = None
+
+        # Render thread, started with the first frame and fed through the
+        # condition: it wakes up when the buffer reaches buffer_size or when
+        # render_pending is called, and holds draw_lock while it draws
+        self._condition = Condition()
+        self.draw_lock = RLock()
+        self.thread = None
+        self.rendering = False
+        self._flush_requested = False
+        # Set while the run or the replay is paused, the buffer is then only
+        # drawn when render_pending is forced, e.g. after a single step
+        self.paused = False
+        self._force_render = False
+
+        # Frame and draw counters, shown by the overlay when show_metrics is set
+        self.metrics = METRICS
+        self.show_metrics = False
+
+    def _apply_frame(self, frame):
+        """Apply a buffered frame to the render state."""
+        changes, settings, keyframe = frame
+        if keyframe is not None:
+            self.last_maze = keyframe
+        elif self.last_maze is None:
+            self.last_maze = self._maze.copy()
+        self.last_maze.apply(changes)
+        if changes:
+            self._focus = changes[-1][:2]
+        height = self.last_maze.height
+        self._dirty.update(x * height + y for x, y, _, _ in changes)
+        self.render_settings = settings
+
+    def _take_buffer(self):
+        with self._condition:
+            frames = list(self.buffer)
             self.buffer.clear()
-            self.thread.join()
-
-    def update_thread(self):
-        if hasattr(self, "thread") and self.thread is not None:
-            if self.thread.is_alive():
-                time.sleep(1 / self.max_fps)
-                return
-            self.thread = Thread(target=self.update, args=(self.frame_no,))
-            self.thread.start()
-        else:
-            self.thread = Thread(target=self.update, args=(self.frame_no,))
+        return frames
+
+    def dump_buffer(self):
+        """Apply every buffered frame and print the resulting maze"""
+        with self.draw_lock:
+            frames = self._take_buffer()
+            if frames:
+                started = time.perf_counter()
+                for frame in frames:
+                    self._apply_frame(frame)
+                self._paint(self.last_maze)
+                self._count_draw(frames, time.perf_counter() - started)
+                self._frame.canvas.refresh()
+                self._frame.screen.refresh()
+
+    def _start_render_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = Thread(
+                target=self._render_loop, name="maze-render", daemon=True
+            )
             self.thread.start()
-        time.sleep(1 / self.max_fps)
-
-    def compute(self, maze):
-        # Compute the maze all at once and store the result in the buffer
-        copy = [row[:] for row in maze]
-        shortest_path = [row[:] for row in self.shortest_path]
-        self.buffer.append([copy, [self.random_color, self.BFS, shortest_path]])
-        # Dump the buffer if it's full
-        # Use another thread to update the screen
-        if len(self.buffer) >= self.buffer_size:
-            self.update_thread()
-
-    def print_infos(self):
-        self._frame.canvas.print_at(
-            f"Buffer length: {len(self.buffer)}".center(30),
-            10,
-            2,
-            colour=Screen.COLOUR_WHITE,
-            bg=Screen.COLOUR_BLACK,
-        )
-        self._frame.canvas.print_at(
-            f"Buffer max size: {self.buffer_size}".center(30),
-            10,
-            3,
-            colour=Screen.COLOUR_WHITE,
-            bg=Screen.COLOUR_BLACK,
-        )
-        self._frame.canvas.print_at(
-            f"Save interval: {self.save_interval}".center(30),
-            10,
-            4,
-            colour=Screen.COLOUR_WHITE,
-            bg=Screen.COLOUR_BLACK,
-        )
-        self._frame.canvas.print_at(
-            f"Total frames: {self.total_frames}".center(30),
-            10,
-            5,
-            colour=Screen.COLOUR_WHITE,
-            bg=Screen.COLOUR_BLACK,
-        )
+
+    def render_pending(self, force=False):
+        """Wake the render thread up for the frames left under the buffer threshold.
+
+        `force` draws them even while the widget is paused.
+        """
+        with self._condition:
+            self._flush_requested = True
+            self._force_render = self._force_render or force
+            if self.buffer:
+                self._start_render_thread()
+            self._condition.notify_all()
+
+    def _should_render(self):
+        if not self.buffer or (self.paused and not self._force_render):
+            return False
+        return len(self.buffer) >= self.buffer_size or self._flush_requested
+
+    def _render_loop(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(self._should_render)
+                self.rendering = True
+                self.buffer_length = len(self.buffer)
+            try:
+                self._render_buffer(1 / self.max_fps)
+            finally:
+                with self._condition:
+                    self.rendering = False
+                    self._flush_requested = self._force_render = False
+                    self._condition.notify_all()
+
+    def _render_buffer(self, frame_time):
+        """Draw the buffered frames until the buffer is empty, holding max_fps.
+
+        Each draw applies every frame queued since the previous one and only
+        draws the last state, then sleeps the time left in the frame. The
+        animation never lags behind the run, however slow the drawing is.
+        """
+        while True:
+            with self._condition:
+                if not self._should_render():
+                    return
+                frames = list(self.buffer)
+                self.buffer.clear()
+                self._force_render = False
+
+            started = time.perf_counter()
+            with self.draw_lock:
+                for frame in frames:
+                    self._apply_frame(frame)
+                self._paint(self.last_maze)
+                self._frame.canvas.refresh()
+                self._frame.screen.refresh()
+                self._frame.screen.force_update()
+            elapsed = time.perf_counter() - started
+            self._count_draw(frames, elapsed)
+            time.sleep(max(0, frame_time - elapsed))
+
+    def compute(self, changes):
+        """Store a frame made of (x, y, kind, label) cell-change events."""
+        self._push_frame(list(changes), None)
+
+    def compute_keyframe(self, maze):
+        """Store a full copy of the maze, used when the whole maze changed."""
+        self._maze = maze
+        self._push_frame([], maze.copy())
+
+    def _push_frame(self, changes, keyframe):
+        # The shortest path only grows during a run, share it instead of copying
+        settings = (self.random_color, self.BFS, self.shortest_path)
+        self.metrics.increment("frames_produced")
+        with self._condition:
+            if keyframe is not None:
+                # The keyframe replaces the whole maze, the frames queued
+                # before it would never be seen
+                self.metrics.increment("frames_dropped", len(self.buffer))
+                self.buffer.clear()
+            elif len(self.buffer) >= self.buffer_size:
+                # The render thread is behind and only draws the last state:
+                # merge the frame into the last one to bound the buffer
+                last_changes, _, last_keyframe = self.buffer.pop()
+                last_changes.extend(changes)
+                changes, keyframe = last_changes, last_keyframe
+                self.metrics.increment("frames_dropped")
+            self.buffer.append((changes, settings, keyframe))
+            # The render thread draws the buffer once it is full, the caller
+            # never waits for it
+            if len(self.buffer) >= self.buffer_size:
+                self._start_render_thread()
+                self._condition.notify()
+
+    def _count_draw(self, frames, elapsed):
+        """Record a draw of the buffered `frames`, all but the last were dropped."""
+        if frames:
+            self.metrics.record_time("draw", elapsed)
+            self.metrics.increment("frames_drawn")
+            self.metrics.increment("frames_dropped", len(frames) - 1)
+
+    def toggle_metrics(self):
+        self.show_metrics = not self.show_metrics
+        self.invalidate()
+
+    def metrics_lines(self):
+        """Text lines of the metrics overlay."""
+        metrics = self.metrics
+        lines = [
+            f"Cells expanded: {metrics.get('cells_expanded')}",
+            f"Peak queue size: {metrics.get('queue_size')}",
+            f"Steps reported: {self.total_frames}",
+            "Frames produced/drawn/dropped: "
+            f"{metrics.get('frames_produced')}/{metrics.get('frames_drawn')}"
+            f"/{metrics.get('frames_dropped')}",
+            f"Buffer: {len(self.buffer)}/{self.buffer_size}, "
+            f"save interval {self.save_interval}",
+        ]
+        for name in ("draw", "generate", "solve", "path"):
+            timing = metrics.timing(name)
+            if timing is not None:
+                lines.append(
+                    f"{name.capitalize()}: {timing['last'] * 1000:.1f} ms "
+                    f"(mean {timing['mean'] * 1000:.1f}, "
+                    f"max {timing['max'] * 1000:.1f})"
+                )
+        return lines
+
+    def print_metrics(self):
+        """Print the metrics overlay in the top right corner of the canvas."""
+        lines = self.metrics_lines()
+        width = max(len(line) for line in lines) + 2
+        canvas = self._frame.canvas
+        x = max(0, canvas.width - width - 1)
+        for y, line in enumerate(lines, start=1):
+            canvas.print_at(
+                f" {line}".ljust(width),
+                x,
+                y,
+                colour=Screen.COLOUR_WHITE,
+                bg=Screen.COLOUR_BLACK,
+            )
 
     def update(self, frame_no):
-        # Draw the current frame from the buffer
-        self.buffer_length = (
-            len(self.buffer) if len(self.buffer) != 0 else self.buffer_length
-        )
-        while self.buffer:
-            # Depending on maze size, we might need to skip some frames
-
-            self.last_maze = self.buffer.popleft()
-            self.last_settings = self.last_maze[1]
-            self.last_maze = self.last_maze[0]
-            self.random_color = self.last_settings[0]
-            self.BFS = self.last_settings[1]
-            self.shortest_path = self.last_settings[2]
-            self._draw(self.last_maze)
-
-            self.print_infos()
-            # Sleep to control the speed of the animation
-            # use buffer length to adjust the speed
-            self.frame.canvas.refresh()
-            self._frame.screen.refresh()
-            self._frame.screen.force_update()
-            sleep_time = 1 / self.max_fps
-            time.sleep(sleep_time)
-
-        # If the buffer is empty, draw
-        # the last maze
-        if not self.buffer and self.last_maze is not None:
-            self._draw(self.last_maze)
-            self._frame.canvas.refresh()
-            self._frame.screen.refresh()
-            # time.sleep(1 / self.max_fps)
-        elif not self.buffer:
-            self._draw(self._maze)
+        # The frame cleared the canvas: repaint the state drawn last, the
+        # buffered frames are left to the render thread
+        with self.draw_lock:
+            if self.last_maze is not None:
+                self._paint(self.last_maze)
+            else:
+                self._paint(self._maze)
 
     @property
     def value(self):
@@ -267,140 +523,252 @@ class MazeWidget(Widget):
     def value(self, new_value):
         self._value = new_value
 
-    def _draw_cell(
-        self, fixedWidth, y, x, laby_with_walls, sizeX, sizeY, start_x, start_y
-    ):
-        cell = laby_with_walls[x][y]
-        color = COLOR_MAP.get(cell, Screen.COLOUR_BLACK)
-
-        # Handle cases where the cell contains a number or letter
-        if str(cell).isdigit():
-            color = COLOR_MAP.get(VISITED, Screen.COLOUR_BLACK)
-            # Add a random color, but same color for the same number
-            if self.random_color:
-                possible_colours = [c for c in range(17, 231)]
-
-                color = possible_colours[hash(str(cell)) % 214]
-                if cell == 0:
-                    color = Screen.COLOUR_BLACK
-
-            # If BFS is running, color the visited cells, from yellow to red, the farther the redder
-            if self.BFS and (cell == VISITED or str(cell).isdigit() or cell == EMPTY):
-                # Change color based on the scale
-                # the greater is the number, the redder is the color
-                # based on percentage of buffer done
-                if self.buffer_length != 0:
-                    percentage = int(cell) / (sizeX * sizeY)
-                else:
-                    percentage = 1
-                percentage = (1 - percentage) * 100
-                if percentage < 0:
-                    percentage = 0
-
-                # check if terminal supports 256 colors
-                if (
-                    os.getenv("TERM") == "xterm-256color"
-                    or os.getenv("TERM") == "tmux-256color"
-                ):
-                    # From brightest to darkest (purple to red)
-                    purple = (255, 0, 255)
-                    red = (255, 0, 0)
-                    blue = (0, 0, 255)
-                    cyan = (0, 255, 255)
-                    brown = (165, 42, 42)
-                    orange = (255, 165, 0)
-                    green = (0, 255, 0)
-                    yellow = (255, 255, 0)
-
-                    gradient_colors = create_gradient(red)
-
-                    # invert the gradient colors
-                    gradient_colors = gradient_colors[::-1]
-
-                    # Gradient_colors : brightest = index 0, darkest = index -1
-                    color = get_color_from_percentage(gradient_colors, percentage, 4)
-
-                else:
-                    if percentage < 10:
-                        color = Screen.COLOUR_MAGENTA
-                    elif percentage < 25:
-                        color = Screen.COLOUR_RED
-                    elif percentage < 66:
-                        color = Screen.COLOUR_YELLOW
-                    else:
-                        color = Screen.COLOUR_CYAN
-
-            if self.shortest_path and [x, y] in self.shortest_path:
-                time.sleep(10)
-                color = Screen.COLOUR_GREEN
-                cell = VISITED
-
-            self._frame.canvas.print_at(
-                f"{cell if not self.color_only else EMPTY}".center(fixedWidth),
-                start_x + x * fixedWidth,
-                start_y + y,
-                colour=color,
-                bg=color if self.color_only else Screen.COLOUR_BLACK,
-            )
+    def pan(self, dx, dy):
+        """Move the viewport by (dx, dy) cells, which stops following the solver."""
+        self.follow = False
+        self.camera = [self.camera[0] + dx, self.camera[1] + dy]
+
+    def toggle_follow(self):
+        self.follow = not self.follow
+
+    def _viewport(self, sizeX, sizeY, fixedWidth, location_y):
+        """Clamp the camera to the maze and return (camera_x, camera_y, columns, rows).
+
+        The window is as large as the canvas allows, so the draw cost only
+        depends on the terminal size. When following, the camera is recentered
+        once the focus gets closer than a quarter of the window to its edges.
+        """
+        canvas = self._frame.canvas
+        columns = max(1, min(sizeX, (canvas.width - 2) // fixedWidth))
+        rows = max(1, min(sizeY, canvas.height - location_y - 1))
+        camera_x, camera_y = self.camera
+        if self.follow and self._focus is not None:
+            focus_x, focus_y = self._focus[0] + 1, self._focus[1] + 1
+            if not columns // 4 <= focus_x - camera_x < columns - columns // 4:
+                camera_x = focus_x - columns // 2
+            if not rows // 4 <= focus_y - camera_y < rows - rows // 4:
+                camera_y = focus_y - rows // 2
+        camera_x = min(max(camera_x, 0), sizeX - columns)
+        camera_y = min(max(camera_y, 0), sizeY - rows)
+        self.camera = [camera_x, camera_y]
+        self.view_size = (columns, rows)
+        return camera_x, camera_y, columns, rows
+
+    def invalidate(self):
+        """Force the next draw to repaint everything, e.g. after a canvas clear."""
+        self._drawn_layout = None
+
+    def _label_table(self, size, kind=KIND_LABEL):
+        """Return the label to colour table of the current colour mode."""
+        random_color, BFS, _ = self.render_settings
+        if BFS and kind == KIND_GOAL_LABEL:
+            key = ("goal_heat", size, self.buffer_length != 0)
+        elif BFS:
+            key = ("heat", size, self.buffer_length != 0)
+        elif random_color:
+            key = ("palette", size)
         else:
-            if sizeX % 2 == 0:
-                if x < sizeX - 1:
-                    self._frame.canvas.print_at(
-                        f"{cell if not self.color_only else EMPTY}".center(fixedWidth),
-                        start_x + x * fixedWidth,
-                        start_y + y,
-                        colour=color,
-                        bg=color if self.color_only else Screen.COLOUR_BLACK,
-                    )
-            elif sizeY % 2 == 0:
-                if y < sizeY - 1:
-                    self._frame.canvas.print_at(
-                        f"{cell if not self.color_only else EMPTY}".center(fixedWidth),
-                        start_x + x * fixedWidth,
-                        start_y + y,
-                        colour=color,
-                        bg=color if self.color_only else Screen.COLOUR_BLACK,
-                    )
+            key = ("visited",)
+
+        table = self._label_tables.get(key)
+        if table is None:
+            if BFS and kind == KIND_GOAL_LABEL:
+                table = build_heat_table(size, self.colour_256, key[2], GOAL_HEAT)
+            elif BFS:
+                table = build_heat_table(size, self.colour_256, key[2])
+            elif random_color:
+                table = build_palette_table(size)
             else:
-                self._frame.canvas.print_at(
-                    f"{cell if not self.color_only else EMPTY}".center(fixedWidth),
-                    start_x + x * fixedWidth,
-                    start_y + y,
-                    colour=color,
-                    bg=color if self.color_only else Screen.COLOUR_BLACK,
-                )
-
-    def _draw(self, maze):
-        sizeX = len(maze)
-        sizeY = len(maze[0])
-
-        if sizeY % 2 != 0:
-            laby_with_walls = [[WALL] + row + [WALL] for row in maze]
-            top_bottom_wall_row = [WALL] * (sizeY + 2)
+                table = bytes([KIND_COLOURS[KIND_VISITED]])
+            self._label_tables[key] = table
+        return table
+
+    def _row_colours(self, kinds, labels, start, stop, tables, step=1):
+        """Colours of the cells in [start, stop) every `step`, looked up at once."""
+        row = kinds[start:stop:step]
+        colours = bytearray(row.translate(KIND_COLOUR_TABLE))
+        for kind, table in tables.items():
+            last = len(table) - 1
+            position = row.find(kind)
+            while position != -1:
+                colours[position] = table[min(labels[start + position * step], last)]
+                position = row.find(kind, position + 1)
+        return colours
+
+    def _print_runs(self, cells, screen_y, origin_x, fixedWidth):
+        """Print a screen row of (drawing x, colour, text) cells sorted by x.
+
+        Adjacent cells of the same colour are joined in a single print_at call.
+        """
+        run_x = run_colour = None
+        texts = []
+        for x, colour, text in cells:
+            if texts and (colour != run_colour or x != run_x + len(texts)):
+                screen_x = origin_x + run_x * fixedWidth
+                self._print_run(texts, run_colour, screen_x, screen_y, fixedWidth)
+                texts = []
+            if not texts:
+                run_x, run_colour = x, colour
+            texts.append(text)
+        if texts:
+            screen_x = origin_x + run_x * fixedWidth
+            self._print_run(texts, run_colour, screen_x, screen_y, fixedWidth)
+
+    def _print_run(self, texts, color, screen_x, screen_y, fixedWidth):
+        if self.color_only:
+            line = EMPTY.center(fixedWidth) * len(texts)
         else:
-            laby_with_walls = [[WALL] + row for row in maze]
-            top_bottom_wall_row = [WALL] * (sizeY + 1)
-
-        laby_with_walls = (
-            [top_bottom_wall_row] + laby_with_walls + [top_bottom_wall_row]
+            line = "".join(text.center(fixedWidth) for text in texts)
+        self._frame.canvas.print_at(
+            line,
+            screen_x,
+            screen_y,
+            colour=color,
+            bg=color if self.color_only else Screen.COLOUR_BLACK,
         )
 
-        sizeX = len(laby_with_walls)
-        sizeY = len(laby_with_walls[0])
+    def _paint(self, maze):
+        """Draw the maze, then the metrics overlay on top of it when shown."""
+        self._draw(maze)
+        if self.show_metrics:
+            self.print_metrics()
+
+    def _draw(self, maze):
+        kinds, labels = maze.kinds, maze.labels
+        mazeHeight = maze.height
+
+        # The maze is drawn inside a border of walls, the right border
+        # is only added when the maze does not already end with a wall
+        sizeX = maze.width + 2
+        sizeY = mazeHeight + 2 if mazeHeight % 2 != 0 else mazeHeight + 1
 
         fixedWidth = getFixedWidth(sizeX, sizeY)
         if self.no_spaces:
             fixedWidth = 2
 
         widget_location = self.get_location()
-        start_x = (self._frame.canvas.width - (sizeX * fixedWidth)) // 2
-        start_y = (self._frame.canvas.height - sizeY + widget_location[1]) // 2
-
-        for i in range(sizeY):
-            for j in range(sizeX):
-                self._draw_cell(
-                    fixedWidth, i, j, laby_with_walls, sizeX, sizeY, start_x, start_y
-                )
+        view = self._viewport(sizeX, sizeY, fixedWidth, widget_location[1])
+        camera_x, camera_y, columns, rows = view
+        start_x = (self._frame.canvas.width - (columns * fixedWidth)) // 2
+        start_y = (self._frame.canvas.height - rows + widget_location[1]) // 2
+
+        # Everything that changes the position or the colour of every cell
+        layout = (
+            fixedWidth,
+            start_x,
+            start_y,
+            view,
+            self.render_settings[:2],
+            self.buffer_length != 0,
+        )
+        if maze is not self._drawn_maze or layout != self._drawn_layout:
+            # Full redraw of the window, borders included
+            self._drawn_maze = maze
+            self._drawn_layout = layout
+            self._drawn = {}
+            dirty = None
+        else:
+            # Incremental redraw, only the cells touched since the last draw
+            dirty = self._dirty
+        self._dirty = set()
+
+        # Tables are only built for the labelled kinds present in the maze
+        tables = {
+            kind: self._label_table(sizeX * sizeY, kind)
+            for kind in (KIND_LABEL, KIND_GOAL_LABEL)
+            if kind in kinds
+        }
+        # Only the cells inside the window are drawn, the origin is shifted
+        # so that the camera cell lands on the top-left of the window
+        firstX, lastX = max(camera_x - 1, 0), min(camera_x - 1 + columns, maze.width)
+        firstY, lastY = max(camera_y - 1, 0), min(camera_y - 1 + rows, mazeHeight)
+        origin_x = start_x - camera_x * fixedWidth
+        origin_y = start_y - camera_y
+        if dirty is None:
+            self._draw_window(
+                maze,
+                tables,
+                sizeX,
+                sizeY,
+                view,
+                (firstX, lastX),
+                fixedWidth,
+                origin_x,
+                origin_y,
+            )
+            return
+
+        # Changed cells are grouped by screen row to print them in runs
+        dirty_rows = {}
+        for index in dirty:
+            x, y = divmod(index, mazeHeight)
+            if firstX <= x < lastX and firstY <= y < lastY:
+                dirty_rows.setdefault(y, []).append(x)
+        for y, xs in dirty_rows.items():
+            xs.sort()
+            cells = []
+            for x in xs:
+                index = x * mazeHeight + y
+                table = tables.get(kinds[index])
+                if table is not None:
+                    color = table[min(labels[index], len(table) - 1)]
+                else:
+                    color = KIND_COLOURS[kinds[index]]
+                text = self._changed_cell_text(maze, index, color)
+                if text is not False:
+                    cells.append((x + 1, color, text))
+            self._print_runs(cells, origin_y + y + 1, origin_x, fixedWidth)
+
+    def _draw_window(
+        self, maze, tables, sizeX, sizeY, view, visibleX, fixedWidth, origin_x, origin_y
+    ):
+        """Draw every visible row of the maze and its border, one run at a time."""
+        kinds, labels, mazeHeight = maze.kinds, maze.labels, maze.height
+        camera_x, camera_y, columns, rows = view
+        firstX, lastX = visibleX
+        wall = KIND_COLOURS[KIND_WALL]
+        # The right border is skipped when the maze already ends with a wall row
+        borderX = sizeX - 1 if sizeX % 2 == 0 else sizeX
+        # The bottom border only exists when the maze does not end with a wall
+        bottom = sizeY - 1 if sizeY > mazeHeight + 1 else None
+        lastColumn = min(borderX, camera_x + columns)
+
+        for drawY in range(camera_y, camera_y + rows):
+            if drawY == 0 or drawY == bottom:
+                cells = [(x, wall, WALL) for x in range(camera_x, lastColumn)]
+                self._print_runs(cells, origin_y + drawY, origin_x, fixedWidth)
+                continue
+
+            y = drawY - 1
+            cells = [(0, wall, WALL)] if camera_x == 0 else []
+            colours = self._row_colours(
+                kinds,
+                labels,
+                firstX * mazeHeight + y,
+                lastX * mazeHeight,
+                tables,
+                mazeHeight,
+            )
+            for x, color in enumerate(colours, firstX):
+                text = self._changed_cell_text(maze, x * mazeHeight + y, color)
+                if text is not False:
+                    cells.append((x + 1, color, text))
+            if borderX == sizeX and lastColumn == sizeX:
+                cells.append((sizeX - 1, wall, WALL))
+            self._print_runs(cells, origin_y + drawY, origin_x, fixedWidth)
+
+    def _changed_cell_text(self, maze, index, color):
+        """Text to print for a cell, or False if it is already drawn like this."""
+        # Only the colour is shown in colour-only mode, the text is not needed
+        if self.color_only:
+            text = key = color
+        else:
+            text = KIND_SYMBOLS[maze.kinds[index]] or str(maze.labels[index])
+            key = (color, text)
+        if self._drawn.get(index) == key:
+            return False
+        self._drawn[index] = key
+        return text
 
     def reset(self):
         pass
@@ -409,6 +777,9 @@ class MazeWidget(Widget):
         return event
 
     def required_height(self, offset, width):
+        # Larger mazes are shown through the viewport
+        if self._frame is not None:
+            return min(self._required_height, self._frame.screen.height)
         return self._required_height
 
     def required_width(self, offset, w, h, options):
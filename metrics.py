@@ -0,0 +1,140 @@
+"""Counters, peak values and timings of the solver runs and of the renderer.
+
+The solver menu and the maze widget report into the shared `METRICS` registry:
+
+    cells_expanded     cells expanded by the last solver run
+    queue_size         peak size of the solver queue, or of the DFS stack
+    frames_produced    frames pushed to the widget buffer
+    frames_drawn       frames whose state was drawn on the canvas
+    frames_dropped     frames applied or merged without being drawn
+    draw               time of each draw of the maze
+    generate, solve, path
+                       time of each phase of a run
+    distance_field     time spent filling the distance cache after a BFS
+
+`snapshot` returns everything as a dict, the overlay of the maze widget shows
+it and `dump_at_exit` writes it to a JSON file when the program ends, with
+`python main.py --metrics FILE` or the MAZE_METRICS_FILE environment variable.
+"""
+
+import atexit
+import json
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+from step_runner import around_steps
+
+# Counters and peaks describing a single run, reset by reset_run
+RUN_METRICS = ("cells_expanded", "queue_size")
+
+
+class Metrics:
+    """Registry of named counters, peaks and timings, shared between threads."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.peaks = {}
+            # name: [count, total, max, last] in seconds
+            self.timings = {}
+
+    def reset_run(self):
+        """Forget the metrics of the previous run, the session totals are kept."""
+        with self._lock:
+            for name in RUN_METRICS:
+                self.counters.pop(name, None)
+                self.peaks.pop(name, None)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name, value):
+        self.counters[name] = value
+
+    def peak(self, name, value):
+        # Called on every solver step, only lock when the peak grows
+        if value > self.peaks.get(name, 0):
+            with self._lock:
+                self.peaks[name] = max(value, self.peaks.get(name, 0))
+
+    def record_time(self, name, seconds):
+        with self._lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                self.timings[name] = [1, seconds, seconds, seconds]
+            else:
+                timing[0] += 1
+                timing[1] += seconds
+                timing[2] = max(timing[2], seconds)
+                timing[3] = seconds
+
+    @contextmanager
+    def timed(self, name):
+        """Record the time spent in the with block under `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_time(name, time.perf_counter() - started)
+
+    def timed_steps(self, name, steps):
+        """Yield from a step generator, recording the time spent in its steps.
+
+        The time spent between two steps, e.g. drawing the screen when the run
+        is driven by a StepRunner, is not counted.
+        """
+        clock = [0.0, 0.0]
+
+        def enter():
+            clock[1] = time.perf_counter()
+
+        def leave():
+            clock[0] += time.perf_counter() - clock[1]
+
+        result = yield from around_steps(steps, enter, leave)
+        self.record_time(name, clock[0])
+        return result
+
+    def get(self, name, default=0):
+        return self.counters.get(name, self.peaks.get(name, default))
+
+    def timing(self, name):
+        """Return the {count, total, mean, max, last} dict of a timing, or None."""
+        with self._lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                return None
+            count, total, longest, last = timing
+        return {
+            "count": count,
+            "total": total,
+            "mean": total / count,
+            "max": longest,
+            "last": last,
+        }
+
+    def snapshot(self):
+        with self._lock:
+            counters, peaks = dict(self.counters), dict(self.peaks)
+            names = list(self.timings)
+        return {
+            "counters": counters,
+            "peaks": peaks,
+            "timings": {name: self.timing(name) for name in names},
+        }
+
+    def dump(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def dump_at_exit(self, filename):
+        atexit.register(self.dump, filename)
+
+
+METRICS = Metrics()
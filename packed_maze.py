@@ -0,0 +1,175 @@
+from collections import deque
+
+from maze_constants import (
+    EAST,
+    KIND_EMPTY,
+    KIND_WALL,
+    NO_DIRECTION,
+    NORTH,
+    OPPOSITE_DIRECTIONS,
+    SOUTH,
+    WALL,
+    WEST,
+)
+from maze_grid import MazeGrid
+
+EAST_WALL = 1
+SOUTH_WALL = 2
+
+
+class PackedMaze:
+    """Bit-packed walls of a maze, two bits per logical cell.
+
+    Logical cells are the even positions of the generateLabyrinth grid, cell
+    (cx, cy) sitting at (2 * cx, 2 * cy). Each cell keeps a bit for the wall on
+    its east side (towards cx + 1) and one for the wall on its south side
+    (towards cy + 1), so a 4096x4096 maze fits in 4 MB. Cells are indexed
+    `cx * cellsY + cy` like the MazeGrid planes, four cells per byte.
+
+    Walls on the outer border are always set. The grid conversions are lossless
+    for any grid whose cells are open and whose odd/odd positions are walls,
+    start, goal and labels are not kept.
+    """
+
+    def __init__(self, width, height, walls=None):
+        self.width = width
+        self.height = height
+        self.cellsX = (width + 1) // 2
+        self.cellsY = (height + 1) // 2
+        size = (self.cellsX * self.cellsY + 3) // 4
+        self.walls = walls if walls is not None else bytearray(b"\xff" * size)
+
+    @classmethod
+    def from_grid(cls, maze):
+        """Pack the walls of a MazeGrid."""
+        return cls.from_rows(
+            maze.width,
+            maze.height,
+            (
+                maze.kinds[x * maze.height : (x + 1) * maze.height]
+                for x in range(maze.width)
+            ),
+            KIND_WALL,
+        )
+
+    @classmethod
+    def from_rows(cls, width, height, rows, wall=WALL):
+        """Pack a grid given row by row, like the rows yielded by eller_rows.
+
+        Only one row is looked at at a time, so a streamed maze never needs the
+        full grid in memory. Any value other than `wall` is an open position.
+        """
+        packed = cls(width, height)
+        cellsY = packed.cellsY
+        for x, row in enumerate(rows):
+            if len(row) != height:
+                raise ValueError(f"Row {x} has {len(row)} cells, expected {height}")
+            cx = x // 2
+            if x % 2 == 0:
+                for y in range(0, height, 2):
+                    if row[y] == wall:
+                        raise ValueError(f"Cell ({x}, {y}) is a wall")
+                for y in range(1, height, 2):
+                    if row[y] != wall:
+                        if y + 1 >= height:
+                            raise ValueError(f"Border ({x}, {y}) is open")
+                        packed.open_wall(cx * cellsY + y // 2, SOUTH_WALL)
+            else:
+                for y in range(1, height, 2):
+                    if row[y] != wall:
+                        raise ValueError(f"Wall corner ({x}, {y}) is open")
+                for y in range(0, height, 2):
+                    if row[y] != wall:
+                        if x + 1 >= width:
+                            raise ValueError(f"Border ({x}, {y}) is open")
+                        packed.open_wall(cx * cellsY + y // 2, EAST_WALL)
+        return packed
+
+    def to_grid(self):
+        """Unpack to a MazeGrid of KIND_WALL and KIND_EMPTY cells."""
+        width, height, cellsY = self.width, self.height, self.cellsY
+        maze = MazeGrid(width, height)
+        kinds = maze.kinds
+        cellRow = bytes(KIND_EMPTY if y % 2 == 0 else KIND_WALL for y in range(height))
+        wallRow = bytes([KIND_WALL]) * height
+        for x in range(width):
+            row = x * height
+            kinds[row : row + height] = cellRow if x % 2 == 0 else wallRow
+            cx = x // 2
+            for cy in range(cellsY):
+                bits = self.wall_bits(cx * cellsY + cy)
+                if x % 2 == 0:
+                    if not bits & SOUTH_WALL:
+                        kinds[row + 2 * cy + 1] = KIND_EMPTY
+                elif not bits & EAST_WALL:
+                    kinds[row + 2 * cy] = KIND_EMPTY
+        return maze
+
+    def cell(self, cx, cy):
+        return cx * self.cellsY + cy
+
+    def position(self, cell):
+        return divmod(cell, self.cellsY)
+
+    def wall_bits(self, cell):
+        """EAST_WALL and SOUTH_WALL bits of a cell."""
+        return (self.walls[cell >> 2] >> ((cell & 3) << 1)) & 3
+
+    def open_wall(self, cell, wall):
+        self.walls[cell >> 2] &= ~(wall << ((cell & 3) << 1)) & 0xFF
+
+    def close_wall(self, cell, wall):
+        self.walls[cell >> 2] |= wall << ((cell & 3) << 1)
+
+    def neighbors(self, cell):
+        """Get the (direction, cell) of the cells reachable from `cell` (N, E, S, W)."""
+        walls, cellsY = self.walls, self.cellsY
+        neighbors = []
+        north = cell - 1
+        if cell % cellsY and not (walls[north >> 2] >> ((north & 3) << 1)) & SOUTH_WALL:
+            neighbors.append((NORTH, north))
+        bits = walls[cell >> 2] >> ((cell & 3) << 1)
+        if not bits & EAST_WALL:
+            neighbors.append((EAST, cell + cellsY))
+        if not bits & SOUTH_WALL:
+            neighbors.append((SOUTH, cell + 1))
+        west = cell - cellsY
+        if west >= 0 and not (walls[west >> 2] >> ((west & 3) << 1)) & EAST_WALL:
+            neighbors.append((WEST, west))
+        return neighbors
+
+    def bfs(self, start, goal=None):
+        """Breadth-first search from the `start` cell, stopping at `goal` if given.
+
+        Returns (parents, expanded) where parents holds the direction code
+        towards the cell each cell was reached from, like MazeGrid.parents.
+        """
+        parents = bytearray(self.cellsX * self.cellsY)
+        reached = bytearray(len(parents))
+        reached[start] = 1
+        queue = deque([start])
+        expanded = 0
+        while queue:
+            cell = queue.popleft()
+            expanded += 1
+            if cell == goal:
+                break
+            for direction, neighbor in self.neighbors(cell):
+                if not reached[neighbor]:
+                    reached[neighbor] = 1
+                    parents[neighbor] = OPPOSITE_DIRECTIONS[direction]
+                    queue.append(neighbor)
+        if goal is not None and not reached[goal]:
+            raise Exception("No solution")
+        return parents, expanded
+
+    def path(self, parents, goal):
+        """Walk the parents from `goal` back to the start, returns the start first."""
+        offsets = (0, -1, self.cellsY, 1, -self.cellsY)
+        path = [goal]
+        direction = parents[goal]
+        while direction != NO_DIRECTION:
+            path.append(path[-1] + offsets[direction])
+            direction = parents[path[-1]]
+        path.reverse()
+        return path
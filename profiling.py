@@ -0,0 +1,173 @@
+"""Opt-in cProfile and tracemalloc profiling of the menu actions and the renderer.
+
+Enabled with `python main.py --profile DIR` or the MAZE_PROFILE=DIR environment
+variable. `PhaseProfiler.instrument` then wraps the runs started by the solver
+menu and the render bursts of the maze widget; nothing is wrapped when
+profiling is disabled, so it costs nothing. Each run writes to DIR:
+
+    <phase>-<n>.prof        cProfile stats, e.g. `python -m pstats bfs-1.prof`
+    <phase>-<n>.alloc.txt   top allocation sites of the run and its peak
+
+Runs are step generators driven by the screen loop, only their steps are
+profiled, not the screen frames in between. The menu actions that are not
+runs, placing a new start and goal and loading a replay, are profiled as a
+whole.
+
+The render thread is profiled over the whole session into render.prof, and
+allocations.txt lists the top allocation sites still alive at exit.
+"""
+
+import atexit
+import cProfile
+import functools
+import os
+import re
+import tracemalloc
+from contextlib import contextmanager
+
+from step_runner import around_steps
+
+DEFAULT_TOP = 20
+
+# Allocations of the profiler itself and of the import system are not reported
+IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+def _file_name(name):
+    """File name part of a run name, e.g. "A*" gives "astar"."""
+    return re.sub(r"\W+", "_", name.replace("*", "star")).lower()
+
+
+def _enable(profile):
+    try:
+        profile.enable()
+    except ValueError:
+        # Python 3.12+ allows one profiler at a time, the other thread wins
+        pass
+
+
+class PhaseProfiler:
+    """Profiles phases into `directory`, reporting the `top` allocation sites."""
+
+    def __init__(self, directory, top=DEFAULT_TOP):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.top = top
+        self.runs = {}
+        self.render_profile = cProfile.Profile()
+        self.closed = False
+        tracemalloc.start()
+        atexit.register(self.close)
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(IGNORED_TRACES)
+
+    def _write_allocations(self, filename, title, stats):
+        with open(self._path(filename), "w") as f:
+            f.write(title + "\n")
+            for stat in stats[: self.top]:
+                f.write(f"{stat}\n")
+
+    @contextmanager
+    def phase(self, name):
+        """Report on the with block as the next run of the phase `name`.
+
+        Yields the cProfile.Profile of the phase, to enable around the code to
+        profile, the allocations are those of the whole block.
+        """
+        name = _file_name(name)
+        number = self.runs[name] = self.runs.get(name, 0) + 1
+        before = self._snapshot()
+        tracemalloc.reset_peak()
+        profile = cProfile.Profile()
+        try:
+            yield profile
+        finally:
+            peak = tracemalloc.get_traced_memory()[1]
+            # Sites that grew the most first, memory freed by the phase last
+            stats = self._snapshot().compare_to(before, "lineno")
+            stats.sort(key=lambda stat: stat.size_diff, reverse=True)
+            profile.dump_stats(self._path(f"{name}-{number}.prof"))
+            self._write_allocations(
+                f"{name}-{number}.alloc.txt",
+                f"{name} #{number}: peak traced memory {peak} bytes",
+                stats,
+            )
+
+    def profiled_steps(self, name, steps):
+        """Yield from a step generator, profiled as the next run of `name`."""
+        with self.phase(name) as profile:
+            return (
+                yield from around_steps(
+                    steps, lambda: _enable(profile), profile.disable
+                )
+            )
+
+    def action_profiled(self, name, function):
+        """Wrap `function` so that each call is profiled as the next run of `name`."""
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with self.phase(name) as profile:
+                _enable(profile)
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    profile.disable()
+
+        return wrapper
+
+    def render_profiled(self, function):
+        """Wrap `function` so that its calls add up in the render profile."""
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            _enable(self.render_profile)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.render_profile.disable()
+
+        return wrapper
+
+    def instrument(self, frame_class, widget_class):
+        """Profile the runs and the other actions of the menu, and the render bursts."""
+        start_run = frame_class.start_run
+
+        @functools.wraps(start_run)
+        def profiled_start_run(frame, name, steps):
+            return start_run(frame, name, self.profiled_steps(name, steps))
+
+        frame_class.start_run = profiled_start_run
+        for name, method in (
+            ("start and goal", "run_place_start_and_goal"),
+            ("replay", "run_replay"),
+        ):
+            setattr(
+                frame_class,
+                method,
+                self.action_profiled(name, getattr(frame_class, method)),
+            )
+        widget_class._render_buffer = self.render_profiled(widget_class._render_buffer)
+
+    def close(self):
+        """Write the render profile and the allocations alive at exit."""
+        if self.closed:
+            return
+        self.closed = True
+        self.render_profile.dump_stats(self._path("render.prof"))
+        current = tracemalloc.get_traced_memory()[0]
+        self._write_allocations(
+            "allocations.txt",
+            f"At exit: traced memory {current} bytes",
+            self._snapshot().statistics("lineno"),
+        )
+        tracemalloc.stop()
@@ -1,14 +1,53 @@
+import heapq
+from array import array
 from collections import deque
-from generation import checkBounds
-from maze_constants import EMPTY, VISITED, BADWAY, GOAL, START, WALL
+from maze_constants import (
+    NO_DIRECTION,
+    NORTH,
+    EAST,
+    SOUTH,
+    WEST,
+    OPPOSITE_DIRECTIONS,
+    KIND_BADWAY,
+    KIND_EMPTY,
+    KIND_GOAL,
+    KIND_GOAL_LABEL,
+    KIND_LABEL,
+    KIND_VISITED,
+    KIND_WALL,
+)
+from step_runner import run_steps
+
+# NumPy is optional, it is only needed by the vectorized VectorBFS engine
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# VectorBFS gathers the neighbors of the frontier cell by cell instead of
+# shifting masks when the box around the frontier is this many times larger
+SPARSE_FRONTIER_RATIO = 32
 
 
 def print_step(
-    maze, maze_effect, shortest_path=[], randomColor=False, refresh=False, queue_size=0
+    maze,
+    maze_effect,
+    shortest_path=[],
+    randomColor=False,
+    refresh=False,
+    queue_size=0,
+    changes=(),
 ):
-    """Update the maze and refresh the screen."""
+    """Report the cells changed by the last step and refresh the screen.
+
+    `changes` is a sequence of (x, y, kind, label) cell-change events.
+    """
     maze_effect.update_maze(
-        maze, randomColor=randomColor, shortestPath=shortest_path, queue_size=queue_size
+        maze,
+        randomColor=randomColor,
+        shortestPath=shortest_path,
+        queue_size=queue_size,
+        changes=changes,
     )
 
     if refresh:
@@ -16,148 +55,488 @@ def print_step(
         maze_effect.maze_widget.update(0)
 
 
-def check_bounds(maze, x, y):
-    """Check if a position is within maze bounds."""
-    return 0 <= x < len(maze) and 0 <= y < len(maze[0])
+def direction_offsets(maze):
+    """Flat index offset of every direction code."""
+    return (0, -1, maze.height, 1, -maze.height)
 
 
-def get_neighbors(x, y):
-    """Get the four possible neighbors (N, E, S, W)."""
-    return [[x, y - 1], [x + 1, y], [x, y + 1], [x - 1, y]]
+def get_neighbor_directions(maze, index):
+    """Get the (direction, flat index) of the in-bounds neighbors (N, E, S, W)."""
+    height = maze.height
+    y = index % height
+    neighbors = []
+    if y > 0:
+        neighbors.append((NORTH, index - 1))
+    if index + height < len(maze.kinds):
+        neighbors.append((EAST, index + height))
+    if y < height - 1:
+        neighbors.append((SOUTH, index + 1))
+    if index >= height:
+        neighbors.append((WEST, index - height))
+    return neighbors
 
 
-def check_cell(maze, vec2):
-    """Check if the given vector position is traversable or is the goal."""
-    x, y = vec2
-    return check_bounds(maze, x, y) and (maze[x][y] == EMPTY or maze[x][y] == GOAL)
+def get_open_neighbor_directions(maze, index):
+    """Get the (direction, flat index) of the neighbors that are not walls."""
+    kinds = maze.kinds
+    return [
+        (direction, neighbor)
+        for direction, neighbor in get_neighbor_directions(maze, index)
+        if kinds[neighbor] != KIND_WALL
+    ]
 
 
 def visit(maze, pos, step):
     """Mark a cell as visited with the current step."""
-    maze[pos[0]][pos[1]] = step
-
+    maze.set_label(pos[0], pos[1], step)
 
-def bad_way(maze, pos):
-    """Mark a cell as part of a bad way."""
-    maze[pos[0]][pos[1]] = BADWAY
 
+def dfs_steps(maze, maze_effect, start=[0, 0], step=0):
+    """Non-recursive Depth-First Search (DFS) implementation.
 
-def DFS(maze, maze_effect, start=[0, 0], step=0):
-    """Non-recursive Depth-First Search (DFS) implementation."""
-    path = [start]
+    Yields after every step it reports, returns the number of cells expanded.
+    """
+    kinds, labels, parents, height = maze.kinds, maze.labels, maze.parents, maze.height
+    path = [maze.index(*start)]
+    # Cells expanded are the cells visited, backtracking does not count
+    expanded = 1
     visit(maze, start, step)
-    print_step(maze, maze_effect)
+    print_step(maze, maze_effect, changes=[(*start, KIND_LABEL, step)])
+    yield
 
     while path:
         curPos = path[-1]
-        x, y = curPos
 
         # Try to find a valid neighboring cell
         nextCase = None
-        for neighbor in get_neighbors(x, y):
-            if check_cell(maze, neighbor):
+        for direction, neighbor in get_neighbor_directions(maze, curPos):
+            if kinds[neighbor] == KIND_EMPTY or kinds[neighbor] == KIND_GOAL:
                 nextCase = neighbor
+                parents[nextCase] = OPPOSITE_DIRECTIONS[direction]
                 break
 
-        if nextCase:
-            if maze[nextCase[0]][nextCase[1]] == GOAL:
+        if nextCase is not None:
+            if kinds[nextCase] == KIND_GOAL:
                 path.append(nextCase)
                 print_step(maze, maze_effect)
-                return
+                yield
+                return expanded
             # Move to the next valid cell
             path.append(nextCase)
+            expanded += 1
             step += 1
-            visit(maze, nextCase, step)
-            print_step(maze, maze_effect)
+            kinds[nextCase] = KIND_LABEL
+            labels[nextCase] = step
+            x, y = divmod(nextCase, height)
+            print_step(
+                maze,
+                maze_effect,
+                queue_size=len(path),
+                changes=[(x, y, KIND_LABEL, step)],
+            )
+            yield
         else:
             # Backtrack
-            bad_way(maze, curPos)
+            kinds[curPos] = KIND_BADWAY
+            labels[curPos] = 0
             path.pop()
-            print_step(maze, maze_effect)
+            x, y = divmod(curPos, height)
+            print_step(
+                maze,
+                maze_effect,
+                queue_size=len(path),
+                changes=[(x, y, KIND_BADWAY, 0)],
+            )
+            yield
 
     raise Exception("No solution")
 
 
-def BFS(maze, maze_effect, start=[0, 0], step=0):
-    """Breadth-First Search (BFS) implementation."""
+def DFS(maze, maze_effect, start=[0, 0], step=0):
+    """Run dfs_steps to its end, returns the number of cells expanded."""
+    return run_steps(dfs_steps(maze, maze_effect, start, step))
+
+
+def bfs_steps(maze, maze_effect, start=[0, 0], step=0):
+    """Breadth-First Search (BFS) implementation.
+
+    Yields after every step it reports, returns the number of cells expanded.
+    """
+    kinds, labels, parents, height = maze.kinds, maze.labels, maze.parents, maze.height
+    start = maze.index(*start)
     queue = deque([start])
-    visited = set([tuple(start)])  # To avoid revisiting cells
+    visited = bytearray(len(kinds))  # To avoid revisiting cells
+    visited[start] = 1
+    expanded = 0
 
     while queue:
         curPos = queue.popleft()
-        x, y = curPos
+        kind = kinds[curPos]
 
         # If goal is found, return
-        if maze[x][y] == GOAL:
+        if kind == KIND_GOAL:
             print_step(maze, maze_effect, queue_size=len(queue))
-            return
+            yield
+            return expanded
+        expanded += 1
 
         # Visit current cell
-        if maze[x][y] == EMPTY or str(maze[x][y]).isdigit():
-            visit(maze, curPos, step)
-            print_step(maze, maze_effect, queue_size=len(queue))
+        if kind == KIND_EMPTY or kind == KIND_LABEL:
+            kinds[curPos] = KIND_LABEL
+            labels[curPos] = step
+            x, y = divmod(curPos, height)
+            print_step(
+                maze,
+                maze_effect,
+                queue_size=len(queue),
+                changes=[(x, y, KIND_LABEL, step)],
+            )
+            yield
             step += 1
 
         # Add all valid neighbors to the queue
-        for neighbor in get_neighbors(x, y):
-            if check_cell(maze, neighbor) and tuple(neighbor) not in visited:
-                visited.add(tuple(neighbor))
+        for direction, neighbor in get_neighbor_directions(maze, curPos):
+            if not visited[neighbor] and (
+                kinds[neighbor] == KIND_EMPTY or kinds[neighbor] == KIND_GOAL
+            ):
+                visited[neighbor] = 1
+                parents[neighbor] = OPPOSITE_DIRECTIONS[direction]
                 queue.append(neighbor)
 
     raise Exception("No solution")
 
 
-def isdigit(maze, x, y):
-    if check_bounds(maze, x, y):
-        return (
-            str(maze[x][y]).isdigit()
-            and maze[x][y] != GOAL
-            and maze[x][y] != START
-            and maze[x][y] != VISITED
-            and maze[x][y] != WALL
-        )
-    return False
+def BFS(maze, maze_effect, start=[0, 0], step=0):
+    """Run bfs_steps to its end, returns the number of cells expanded."""
+    return run_steps(bfs_steps(maze, maze_effect, start, step))
+
+
+def astar_steps(maze, maze_effect, start=[0, 0], goal=None):
+    """A* search with the Manhattan distance to the goal as heuristic.
+
+    Expanded cells are labelled with their distance to the start. Ties on the
+    estimated cost are broken by the smallest heuristic, then by insertion order.
+    Yields after every step it reports, returns the number of cells expanded.
+    """
+    kinds, labels, parents, height = maze.kinds, maze.labels, maze.parents, maze.height
+    if goal is None:
+        goal = maze.position(kinds.find(bytes((KIND_GOAL,))))
+    goalX, goalY = goal
+
+    start = maze.index(*start)
+    distances = array("i", [-1]) * len(kinds)
+    closed = bytearray(len(kinds))
+    distances[start] = 0
+
+    x, y = divmod(start, height)
+    heuristic = abs(x - goalX) + abs(y - goalY)
+    counter = 0
+    open_set = [(heuristic, heuristic, counter, start)]
+    expanded = 0
+
+    while open_set:
+        _, _, _, curPos = heapq.heappop(open_set)
+        if closed[curPos]:
+            continue
+        closed[curPos] = 1
+        kind = kinds[curPos]
 
+        # If goal is found, return
+        if kind == KIND_GOAL:
+            print_step(maze, maze_effect, queue_size=len(open_set))
+            yield
+            return expanded
+        expanded += 1
 
-def compute_shortest_path(maze, goal, maze_effect):
-    x, y = goal
-    shortest_path = [goal]
-
-    while maze[x][y] != START and (str(maze[x][y]).isdigit() or maze[x][y] != 0):
-        cell = maze[x][y]
-
-        if str(cell).isdigit():
-            cell = int(cell)
-
-        # Get the neighbors of the current cell
-        # and find the one with the smallest value
-        # to move towards the start
-        neighbors = get_neighbors(x, y)
-        next_cell = None
-        min_value = 999999
-        for neighbor in neighbors:
-            # If the neighbor is the start, add it to the path
-            # and return
-            if (
-                checkBounds(maze, neighbor[0], neighbor[1])
-                and maze[neighbor[0]][neighbor[1]] == START
+        # Visit current cell
+        distance = distances[curPos]
+        if kind == KIND_EMPTY or kind == KIND_LABEL:
+            kinds[curPos] = KIND_LABEL
+            labels[curPos] = distance
+            x, y = divmod(curPos, height)
+            print_step(
+                maze,
+                maze_effect,
+                queue_size=len(open_set),
+                changes=[(x, y, KIND_LABEL, distance)],
+            )
+            yield
+
+        # Push the neighbors reached by a shorter path than before
+        for direction, neighbor in get_neighbor_directions(maze, curPos):
+            if closed[neighbor] or not (
+                kinds[neighbor] == KIND_EMPTY or kinds[neighbor] == KIND_GOAL
             ):
-                next_cell = neighbor
-                shortest_path.append(next_cell)
-                print_step(maze, maze_effect, shortest_path=shortest_path)
-                return shortest_path
-            # If the neighbor is a digit, check if it is the smallest
-            if isdigit(maze, neighbor[0], neighbor[1]):
-                if next_cell is None or maze[neighbor[0]][neighbor[1]] < min_value:
-                    next_cell = neighbor
-
-                    min_value = maze[neighbor[0]][neighbor[1]]
-
-        # If a next cell was found, add it to the path
-        if next_cell:
-            x, y = next_cell
-            maze[x][y] = VISITED
-            shortest_path.append(next_cell)
-    print_step(maze, maze_effect, shortest_path=shortest_path)
+                continue
+            if distances[neighbor] != -1 and distances[neighbor] <= distance + 1:
+                continue
+            distances[neighbor] = distance + 1
+            parents[neighbor] = OPPOSITE_DIRECTIONS[direction]
+            x, y = divmod(neighbor, height)
+            heuristic = abs(x - goalX) + abs(y - goalY)
+            counter += 1
+            heapq.heappush(
+                open_set, (distance + 1 + heuristic, heuristic, counter, neighbor)
+            )
+
+    raise Exception("No solution")
+
+
+def AStar(maze, maze_effect, start=[0, 0], goal=None):
+    """Run astar_steps to its end, returns the number of cells expanded."""
+    return run_steps(astar_steps(maze, maze_effect, start, goal))
+
+
+def vector_bfs_steps(maze, maze_effect, start=[0, 0], stop_at_goal=True):
+    """Level-synchronous BFS on NumPy boolean planes, for very large grids.
+
+    The frontier and the visited set are boolean arrays. Each step expands a
+    whole level at once by shifting the frontier in the four directions and
+    masking it with the traversable cells, then reports the level as a single
+    event. Thin frontiers, like in maze corridors, gather their neighbors from
+    the frontier coordinates instead of scanning their whole bounding box.
+    Reached cells are labelled with their distance to the start, so the label
+    plane holds the distance field, and their parent direction points to
+    the first neighbor (N, E, S, W) of the previous level. Distances are the
+    same as BFS; when several shortest paths exist the one kept may differ.
+
+    With stop_at_goal=False the whole reachable maze is explored.
+    Yields after every step it reports, returns the number of cells expanded.
+    """
+    if np is None:
+        raise ImportError("VectorBFS requires numpy")
+
+    width, height = maze.width, maze.height
+    kinds = np.frombuffer(maze.kinds, dtype=np.uint8).reshape(width, height)
+    labels = np.frombuffer(maze.labels, dtype=np.int32).reshape(width, height)
+    parents = np.frombuffer(maze.parents, dtype=np.uint8).reshape(width, height)
+
+    startX, startY = start
+    empty = kinds == KIND_EMPTY
+    goals = kinds == KIND_GOAL
+    # Traversable cells not visited yet
+    unvisited = empty | goals
+    unvisited[startX, startY] = False
+    frontier = np.zeros((width, height), dtype=bool)
+    frontier[startX, startY] = True
+    # Scratch plane for the next level, kept all False between levels
+    reached = np.zeros((width, height), dtype=bool)
+    xs, ys = np.array([startX]), np.array([startY])
+    level = 0
+    expanded = 0
+
+    while len(xs):
+        expanded += len(xs)
+        level += 1
+
+        # Only the bounding box of the frontier, grown by one cell, can change
+        x0, x1 = max(int(xs.min()) - 1, 0), min(int(xs.max()) + 2, width)
+        y0, y1 = max(int(ys.min()) - 1, 0), min(int(ys.max()) + 2, height)
+
+        if len(xs) * SPARSE_FRONTIER_RATIO < (x1 - x0) * (y1 - y0):
+            # Thin frontier (maze corridors): gather its neighbors directly,
+            # scanning the whole box would cost more than the level itself
+            neighborXs = np.concatenate((xs, xs + 1, xs, xs - 1))
+            neighborYs = np.concatenate((ys - 1, ys, ys + 1, ys))
+            inside = (
+                (neighborXs >= 0)
+                & (neighborXs < width)
+                & (neighborYs >= 0)
+                & (neighborYs < height)
+            )
+            neighborXs, neighborYs = neighborXs[inside], neighborYs[inside]
+            free = unvisited[neighborXs, neighborYs]
+            flat = np.unique(neighborXs[free] * height + neighborYs[free])
+            newXs, newYs = np.divmod(flat, height)
+        else:
+            # Shift the frontier towards its four neighbors
+            front = frontier[x0:x1, y0:y1]
+            new = reached[x0:x1, y0:y1]
+            new[:, 1:] |= front[:, :-1]
+            new[:-1, :] |= front[1:, :]
+            new[:, :-1] |= front[:, 1:]
+            new[1:, :] |= front[:-1, :]
+            new &= unvisited[x0:x1, y0:y1]
+
+            newXs, newYs = np.nonzero(new)
+            newXs += x0
+            newYs += y0
+            reached[newXs, newYs] = False
+        unvisited[newXs, newYs] = False
+
+        # Parent: the first neighbor (N, E, S, W) of the frontier
+        directions = np.zeros(len(newXs), dtype=np.uint8)
+        for direction, dx, dy in (
+            (NORTH, 0, -1),
+            (EAST, 1, 0),
+            (SOUTH, 0, 1),
+            (WEST, -1, 0),
+        ):
+            nx, ny = newXs + dx, newYs + dy
+            inside = (nx >= 0) & (nx < width) & (ny >= 0) & (ny < height)
+            found = np.zeros(len(newXs), dtype=bool)
+            found[inside] = frontier[nx[inside], ny[inside]]
+            directions[found & (directions == NO_DIRECTION)] = direction
+        parents[newXs, newYs] = directions
+
+        frontier[xs, ys] = False
+        frontier[newXs, newYs] = True
+        xs, ys = newXs, newYs
+
+        cells = empty[xs, ys]
+        cellXs, cellYs = xs[cells], ys[cells]
+        kinds[cellXs, cellYs] = KIND_LABEL
+        labels[cellXs, cellYs] = level
+        print_step(
+            maze,
+            maze_effect,
+            queue_size=len(xs),
+            changes=[
+                (x, y, KIND_LABEL, level)
+                for x, y in zip(cellXs.tolist(), cellYs.tolist())
+            ],
+        )
+        yield
+
+        if stop_at_goal and goals[xs, ys].any():
+            return expanded
+
+    if stop_at_goal:
+        raise Exception("No solution")
+    return expanded
+
+
+def VectorBFS(maze, maze_effect, start=[0, 0], stop_at_goal=True):
+    """Run vector_bfs_steps to its end, returns the number of cells expanded."""
+    return run_steps(vector_bfs_steps(maze, maze_effect, start, stop_at_goal))
+
+
+def follow_parents(maze, parents, index):
+    """Follow the parent directions from index up to the cell without parent.
+
+    A chain can not be longer than the maze, parents that loop raise instead
+    of following the loop forever.
+    """
+    offsets = direction_offsets(maze)
+    chain = [index]
+    for _ in range(len(parents)):
+        if parents[index] == NO_DIRECTION:
+            return chain
+        index += offsets[parents[index]]
+        chain.append(index)
+    raise Exception("Parent directions loop")
+
+
+def bidirectional_bfs_steps(maze, maze_effect, start=[0, 0], goal=None):
+    """Breadth-First Search running from the start and the goal at the same time.
+
+    The smallest frontier expands one whole level at a time until the two
+    frontiers touch. Each side keeps the distance of the cells it reached in
+    its own plane, the cell kinds are only used for display: cells are labelled
+    with that distance, KIND_LABEL from the start and KIND_GOAL_LABEL from the
+    goal. The goal side keeps its own parent map, the goal half of the path is
+    then pointed towards the start in the maze parent plane.
+    Yields after every step it reports, returns the number of cells expanded.
+    """
+    kinds, labels, height = maze.kinds, maze.labels, maze.height
+    if goal is None:
+        goal = maze.position(kinds.find(bytes((KIND_GOAL,))))
+
+    sources = (maze.index(*start), maze.index(*goal))
+    parents = (maze.parents, bytearray(len(kinds)))
+    # Distance of the cells reached by each side, -1 elsewhere
+    distances = (array("i", [-1]) * len(kinds), array("i", [-1]) * len(kinds))
+    distances[0][sources[0]] = 0
+    distances[1][sources[1]] = 0
+    parents[0][sources[0]] = NO_DIRECTION
+    label_kinds = (KIND_LABEL, KIND_GOAL_LABEL)
+    frontiers = [[sources[0]], [sources[1]]]
+    depths = [0, 0]
+    expanded = 0
+
+    while frontiers[0] and frontiers[1]:
+        # Expand the smallest frontier, ties go to the start side
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        label_kind = label_kinds[side]
+        reached, other = distances[side], distances[1 - side]
+        parent = parents[side]
+        depth = depths[side] + 1
+        depths[side] = depth
+
+        next_frontier = []
+        meeting = None
+        for curPos in frontiers[side]:
+            expanded += 1
+            for direction, neighbor in get_neighbor_directions(maze, curPos):
+                if other[neighbor] >= 0:
+                    # The frontiers touch, keep the shortest junction of the level
+                    length = depth + other[neighbor]
+                    if meeting is None or length < meeting[0]:
+                        meeting = (length, curPos, direction, neighbor)
+                elif reached[neighbor] < 0 and kinds[neighbor] == KIND_EMPTY:
+                    reached[neighbor] = depth
+                    kinds[neighbor] = label_kind
+                    labels[neighbor] = depth
+                    parent[neighbor] = OPPOSITE_DIRECTIONS[direction]
+                    next_frontier.append(neighbor)
+                    x, y = divmod(neighbor, height)
+                    print_step(
+                        maze,
+                        maze_effect,
+                        queue_size=len(next_frontier),
+                        changes=[(x, y, label_kind, depth)],
+                    )
+                    yield
+        frontiers[side] = next_frontier
+
+        if meeting is not None:
+            _, curPos, direction, neighbor = meeting
+            if side == 0:
+                goalSide, towards_start = neighbor, OPPOSITE_DIRECTIONS[direction]
+            else:
+                goalSide, towards_start = curPos, direction
+
+            # Point the goal half of the path towards the start
+            goal_half = follow_parents(maze, parents[1], goalSide)
+            maze.parents[goalSide] = towards_start
+            for previous, index in zip(goal_half, goal_half[1:]):
+                maze.parents[index] = OPPOSITE_DIRECTIONS[parents[1][previous]]
+            print_step(maze, maze_effect)
+            yield
+            return expanded
+
+    raise Exception("No solution")
+
+
+def BidirectionalBFS(maze, maze_effect, start=[0, 0], goal=None):
+    """Run bidirectional_bfs_steps to its end, returns the number of cells expanded."""
+    return run_steps(bidirectional_bfs_steps(maze, maze_effect, start, goal))
+
+
+def shortest_path_steps(maze, goal, maze_effect):
+    """Walk the parent directions recorded by the solver back from the goal.
+
+    Yields after reporting the path and returns it as a list of [x, y] from the
+    goal to the start, the cells in between are marked as visited.
+    """
+    kinds, labels, height = maze.kinds, maze.labels, maze.height
+    chain = follow_parents(maze, maze.parents, maze.index(*goal))
+
+    shortest_path = [list(goal)]
+    changes = []
+    for index in chain[1:]:
+        x, y = divmod(index, height)
+        shortest_path.append([x, y])
+        if index != chain[-1]:
+            kinds[index] = KIND_VISITED
+            labels[index] = 0
+            changes.append((x, y, KIND_VISITED, 0))
+    print_step(maze, maze_effect, shortest_path=shortest_path, changes=changes)
+    yield
 
     return shortest_path
+
+
+def compute_shortest_path(maze, goal, maze_effect):
+    """Run shortest_path_steps to its end, returns the path."""
+    return run_steps(shortest_path_steps(maze, goal, maze_effect))
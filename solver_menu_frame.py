@@ -1,16 +1,37 @@
-from asciimatics.widgets import Frame, Layout, Label, Button, Divider
+from asciimatics.widgets import (
+    Frame,
+    Layout,
+    Label,
+    Button,
+    CheckBox,
+    Divider,
+    DropdownList,
+)
 from asciimatics.exceptions import StopApplication
+from asciimatics.event import KeyboardEvent
 from generation import (
+    DEFAULT_GENERATOR,
+    GENERATION_STEPS,
+    GENERATORS,
     generateLabyrinth,
-    mergeMazeGeneration,
     clear_maze,
     append_start_and_goal,
 )
+from metrics import METRICS
+from maze_trace import RANDOM_COLOUR, TracePlayer, TraceReader, TraceRecorder
 from maze_widget import MazeWidget
-from solver import BFS, DFS, compute_shortest_path
-import time
+from solver import (
+    astar_steps,
+    bfs_steps,
+    bidirectional_bfs_steps,
+    dfs_steps,
+    shortest_path_steps,
+)
+from step_runner import StepRunner
+from contextlib import nullcontext
+from distance_cache import DistanceCache
 import os
-from asciimatics.screen import Screen
+import tempfile
 
 
 # Function to get terminal size
@@ -23,6 +44,44 @@ def getFixedWidth(width, height):
     return len(str(totalSize))
 
 
+# Keys moving the maze viewport, as (dx, dy) in quarters of the visible window
+PAN_KEYS = {
+    ord("w"): (0, -1),
+    ord("a"): (-1, 0),
+    ord("s"): (0, 1),
+    ord("d"): (1, 0),
+}
+FOLLOW_KEY = ord("f")
+METRICS_KEY = ord("m")
+
+DEFAULT_MESSAGE = "Select the algorithm to run:"
+
+# Runs are driven by the screen loop, a generation or a search on every cell
+# of the maze lasts about this many frames at its starting speed
+RUN_FRAMES = 200
+
+# Trace of the last recorded run, replayed by the Replay Last Run button. It
+# goes to the temporary directory unless MAZE_TRACE_FILE names another file
+TRACE_FILE = os.environ.get(
+    "MAZE_TRACE_FILE", os.path.join(tempfile.gettempdir(), "maze_last_run.trace")
+)
+# A replay lasts about this many frames at its starting speed
+REPLAY_FRAMES = 300
+
+# Keys controlling the run or the replay in progress
+PAUSE_KEY = ord("p")
+CANCEL_KEY = ord("x")
+# Multiply the speed
+SPEED_KEYS = {ord("+"): 2, ord("-"): 0.5}
+# Run one step of the paused run
+RUN_STEP_KEY = ord(".")
+REPLAY_REVERSE_KEY = ord("b")
+# Step the paused replay by one step
+REPLAY_STEP_KEYS = {ord(","): -1, ord("."): 1}
+# Seek by a tenth of the trace
+REPLAY_SEEK_KEYS = {ord("<"): -1, ord(">"): 1}
+
+
 class SolverMenuFrame(Frame):
     def __init__(self, screen, sizeX, sizeY):
         super(SolverMenuFrame, self).__init__(
@@ -34,21 +93,43 @@ class SolverMenuFrame(Frame):
         )
         self.set_theme("bright")
         self.maze = generateLabyrinth(sizeX, sizeY)
-        self.generator = None
+        self.generator = DEFAULT_GENERATOR
         self.BFS = False
         self.DFS = False
         self.shortestPath = []
         self.last_screen_size = get_terminal_size()
         self.buffer_iterator = 0
+        # Cell-change events waiting for the next recorded frame
+        self.pending_changes = []
+        # StepRunner of the generation or search in progress, and its name
+        self.run = None
+        self.run_name = None
+        # TracePlayer of the replay being shown, None outside of a replay
+        self.replay = None
+        # Set by input, the next update redraws the whole frame, see _update
+        self.needs_redraw = True
+        self.drawn_message = None
+        # BFS distance fields of the last starts, for BFS runs on the same maze
+        self.distance_cache = DistanceCache()
 
         # Layout for menu options
         self.layout = Layout([2])
 
         self.add_layout(self.layout)
 
-        self.message_label = Label("Select the algorithm to run:")
+        self.message_label = Label(DEFAULT_MESSAGE)
         self.layout.add_widget(self.message_label, 0)
 
+        # Generation algorithm used by the Run Generation button
+        self.generator_list = DropdownList(
+            [(name, name) for name in GENERATORS],
+            label="Generator:",
+            name="generator",
+            on_change=self.select_generator,
+        )
+        self.generator_list.value = self.generator
+        self.layout.add_widget(self.generator_list, 0)
+
         # Buttons to select BFS and DFS
         self.layout.add_widget(Button("Run Generation", self.run_generation), 0)
         self.layout.add_widget(
@@ -56,62 +137,148 @@ class SolverMenuFrame(Frame):
         )
         self.layout.add_widget(Button("Run BFS", self.run_bfs), 0)
         self.layout.add_widget(Button("Run DFS", self.run_dfs), 0)
+        self.layout.add_widget(Button("Run A*", self.run_astar), 0)
+        self.layout.add_widget(
+            Button("Run Bidirectional BFS", self.run_bidirectional_bfs), 0
+        )
+        self.record_box = CheckBox(
+            "Record runs for the replay", label="Trace:", name="record"
+        )
+        self.layout.add_widget(self.record_box, 0)
+        self.layout.add_widget(Button("Replay Last Run", self.run_replay), 0)
         self.layout.add_widget(Button("Quit", self.quit), 0)
 
         self.maze_widget = MazeWidget(self.maze, sizeX, sizeY)
         # Maze display
         self.layout.add_widget(Divider(), 0)
-        self.layout.add_widget(Label("Maze:"), 0)
+        self.layout.add_widget(
+            Label("Maze (w/a/s/d to scroll, f to follow the solver, m for metrics):"), 0
+        )
         self.layout.add_widget(self.maze_widget, 0)
         self.fix()
 
-    def print_infos(self):
-        self.canvas.print_at(
-            f"Buffer length: {len(self.maze_widget.buffer)}".center(30),
-            10,
-            2,
-            colour=Screen.COLOUR_WHITE,
-            bg=Screen.COLOUR_BLACK,
-        )
-        self.canvas.print_at(
-            f"Buffer max size: {self.maze_widget.buffer_size}".center(30),
-            10,
-            3,
-            colour=Screen.COLOUR_WHITE,
-            bg=Screen.COLOUR_BLACK,
-        )
-        self.canvas.print_at(
-            f"Save interval: {self.maze_widget.save_interval}".center(30),
-            10,
-            4,
-            colour=Screen.COLOUR_WHITE,
-            bg=Screen.COLOUR_BLACK,
-        )
-        self.canvas.print_at(
-            f"Total frames: {self.maze_widget.total_frames}".center(30),
-            10,
-            5,
-            colour=Screen.COLOUR_WHITE,
-            bg=Screen.COLOUR_BLACK,
-        )
+    @property
+    def frame_update_count(self):
+        # The screen only updates an idle frame on input, runs and replays
+        # advance on every frame
+        if self.run is not None or self.replay is not None:
+            return 1
+        return super(SolverMenuFrame, self).frame_update_count
 
     def _update(self, frame_no):
-        if (
-            hasattr(self.maze_widget, "thread")
-            and self.maze_widget.thread is not None
-            and self.maze_widget.thread.is_alive()
-        ):
+        if self.run is not None:
+            self.advance_run()
+        # Leave the canvas to the render thread while it animates a run
+        widget = self.maze_widget
+        if widget.rendering or not widget.draw_lock.acquire(blocking=False):
             return
-        super(SolverMenuFrame, self)._update(frame_no)
+        try:
+            if self.replay is not None:
+                self.advance_replay()
+            if self.redraw_needed():
+                self.needs_redraw = False
+                self.drawn_message = self.message_label.text
+                # The frame clears its canvas before updating its widgets
+                widget.invalidate()
+                super(SolverMenuFrame, self)._update(frame_no)
+        finally:
+            widget.draw_lock.release()
+
+    def redraw_needed(self):
+        """Whether this update redraws the frame instead of only advancing.
+
+        Runs and replays update the frame on every screen frame to advance, the
+        render thread draws the maze then. Redrawing the frame clears the canvas
+        and repaints the whole maze, so it is left to input and new messages.
+        """
+        return (
+            (self.run is None and self.replay is None)
+            or self.needs_redraw
+            or self.message_label.text != self.drawn_message
+        )
 
-    def update_maze(self, maze, randomColor=False, shortestPath=[], queue_size=0):
-        """Update the maze being rendered."""
+    def process_event(self, event):
+        self.needs_redraw = True
+        if isinstance(event, KeyboardEvent) and (
+            self.handle_camera_key(event.key_code)
+            or self.handle_control_key(event.key_code)
+        ):
+            return None
+        return super(SolverMenuFrame, self).process_event(event)
+
+    def handle_control_key(self, key_code):
+        """Control the run or the replay in progress, return True if handled."""
+        control = self.run if self.run is not None else self.replay
+        if control is None:
+            return False
+        if key_code == PAUSE_KEY:
+            control.paused = not control.paused
+            # The frames already buffered wait for the resume too
+            self.maze_widget.paused = control.paused
+            self.maze_widget.render_pending()
+        elif key_code in SPEED_KEYS:
+            speed = int(control.speed * SPEED_KEYS[key_code])
+            control.speed = speed or (1 if control.speed > 0 else -1)
+        elif key_code == CANCEL_KEY:
+            if self.run is not None:
+                self.cancel_run()
+            else:
+                self.stop_replay()
+        elif self.run is not None:
+            return self.handle_run_key(key_code)
+        else:
+            return self.handle_replay_key(key_code)
+        return True
+
+    def handle_run_key(self, key_code):
+        if key_code != RUN_STEP_KEY:
+            return False
+        self.run.paused = self.maze_widget.paused = True
+        self.advance_run(1)
+        return True
+
+    def handle_replay_key(self, key_code):
+        replay = self.replay
+        if key_code == REPLAY_REVERSE_KEY:
+            replay.speed = -replay.speed
+        elif key_code in REPLAY_STEP_KEYS:
+            replay.paused = self.maze_widget.paused = True
+            self.show_replay(replay.seek(replay.position + REPLAY_STEP_KEYS[key_code]))
+        elif key_code in REPLAY_SEEK_KEYS:
+            offset = REPLAY_SEEK_KEYS[key_code] * max(1, replay.reader.steps // 10)
+            self.show_replay(replay.seek(replay.position + offset))
+        else:
+            return False
+        return True
+
+    def handle_camera_key(self, key_code):
+        """Pan the maze viewport, toggle auto-follow or the metrics overlay.
+
+        Returns True if the key was handled.
+        """
+        if key_code in PAN_KEYS:
+            dx, dy = PAN_KEYS[key_code]
+            columns, rows = self.maze_widget.view_size
+            self.maze_widget.pan(dx * max(1, columns // 4), dy * max(1, rows // 4))
+        elif key_code == FOLLOW_KEY:
+            self.maze_widget.toggle_follow()
+        elif key_code == METRICS_KEY:
+            self.maze_widget.toggle_metrics()
+        else:
+            return False
+        return True
+
+    def update_maze(
+        self, maze, randomColor=False, shortestPath=[], queue_size=0, changes=()
+    ):
+        """Record the cells changed by a step of the maze being rendered."""
         self.set_shortest_path(shortestPath)
         self.update_maze_widget_attributes(randomColor, shortestPath)
         self.set_save_interval(queue_size)
+        self.pending_changes.extend(changes)
         self.dump_buffer_and_compute_maze(maze)
         self.maze_widget.total_frames += 1
-        self.print_infos()
+        METRICS.peak("queue_size", queue_size)
 
     def set_shortest_path(self, shortestPath):
         """Set the shortest path if it exists."""
@@ -126,7 +293,7 @@ class SolverMenuFrame(Frame):
 
     def set_save_interval(self, queue_size):
         """Set the save interval based on the maze size and BFS queue size."""
-        maze_size = len(self.maze) * len(self.maze[0])
+        maze_size = self.maze.width * self.maze.height
         self.maze_widget.save_interval = maze_size // 100
 
         if self.BFS and queue_size > 0 and not self.maze_widget.shortest_path:
@@ -144,26 +311,142 @@ class SolverMenuFrame(Frame):
             self.maze_widget.save_interval = 1
 
     def dump_buffer_and_compute_maze(self, maze):
-        """Dump the buffer if it's too large, and compute the maze at regular intervals."""
+        """Dump the buffer if it's too large, compute the maze at regular intervals."""
         if self.buffer_iterator % self.maze_widget.save_interval == 0 or self.DFS:
-            self.maze_widget.compute(maze)
+            self.flush_changes()
             self.buffer_iterator = 0
 
         self.buffer_iterator += 1
 
+    def flush_changes(self):
+        """Send the pending cell changes to the widget as one frame."""
+        self.maze_widget.compute(self.pending_changes)
+        self.pending_changes = []
+
+    def reset_render_state(self):
+        """Drop pending changes and send a full copy of the maze to the widget.
+
+        The keyframe replaces the frames still buffered in the widget.
+        """
+        self.replay = None
+        self.pending_changes = []
+        self.buffer_iterator = 0
+        self.maze_widget.paused = False
+        self.maze_widget.compute_keyframe(self.maze)
+        self.maze_widget.render_pending()
+
+    def recording(self, heat):
+        """Maze effect of a run: a TraceRecorder wrapping the frame when enabled.
+
+        Used as a context manager around the solver so the trace is closed even
+        when the run fails. `heat` is True for the BFS-like solvers.
+        """
+        if not self.record_box.value:
+            return nullcontext(self)
+        return TraceRecorder(TRACE_FILE, self.maze, self, heat=heat)
+
+    def run_replay(self):
+        """Replay the last recorded run from its trace, without solving again."""
+        self.cancel_run()
+        if not os.path.exists(TRACE_FILE):
+            self.message_label.text = "No trace yet, tick Record runs first"
+            return
+        reader = TraceReader(TRACE_FILE)
+        self.reset_render_state()
+        self.replay = TracePlayer(reader, max(1, reader.steps // REPLAY_FRAMES))
+        self.message_label.text = (
+            "Replay: p pause, +/- speed, b reverse, ,/. step, </> seek, x exit"
+        )
+        self.show_replay(self.replay.seek(0))
+
+    def advance_replay(self):
+        """Show the next steps of the replay, called once per screen frame."""
+        self.show_replay(self.replay.tick())
+
+    def show_replay(self, update):
+        """Send a TracePlayer update to the widget, for the render thread to draw."""
+        if update is None:
+            return
+        kind, data, flags = update
+        widget = self.maze_widget
+        widget.BFS = self.replay.reader.heat
+        widget.random_color = bool(flags & RANDOM_COLOUR)
+        widget.shortest_path = []
+        if kind == "keyframe":
+            widget.compute_keyframe(data)
+        else:
+            widget.compute(data)
+        widget.total_frames = self.replay.position
+        # Seeking and stepping show the new position even while paused
+        widget.render_pending(force=True)
+
+    def stop_replay(self):
+        """Leave the replay and show the current maze again."""
+        self.message_label.text = DEFAULT_MESSAGE
+        self.reset_render_state()
+
+    def start_run(self, name, steps):
+        """Drive a step generator from the screen loop, a slice per frame."""
+        cells = self.maze.width * self.maze.height
+        METRICS.reset_run()
+        self.run = StepRunner(steps, speed=max(1, cells // RUN_FRAMES))
+        self.run_name = name
+        self.message_label.text = (
+            f"Running {name}: p pause, +/- speed, . step, x cancel"
+        )
+
+    def advance_run(self, count=None):
+        """Run the next slice of the run in progress, `count` steps if given."""
+        try:
+            if not self.run.advance(count):
+                self.run = None
+                self.message_label.text = DEFAULT_MESSAGE
+        except Exception as error:
+            # e.g. "No solution", the maze is left as the search reached it
+            self.run = None
+            self.message_label.text = f"{self.run_name} failed: {error}"
+        if self.pending_changes:
+            self.flush_changes()
+        # A single step is shown even though the run is paused
+        self.maze_widget.render_pending(force=count is not None)
+
+    def cancel_run(self):
+        """Stop the run in progress, the maze is left as the run reached it.
+
+        The frames still buffered are dropped and the maze is drawn once.
+        """
+        if self.run is None:
+            return
+        self.run.cancel()
+        self.run = None
+        self.message_label.text = f"{self.run_name} cancelled"
+        self.reset_render_state()
+
+    def select_generator(self):
+        self.generator = self.generator_list.value
+
     def run_generation(self):
-        sizeX = len(self.maze)
-        sizeY = len(self.maze[0])
+        self.cancel_run()
+        sizeX = self.maze.width
+        sizeY = self.maze.height
         self.maze_widget.needs_update = False
 
         self.BFS = False
         self.DFS = False
         self.shortestPath = []
         self.maze_widget.total_frames = 0
-        # self.update_maze(self.maze, randomColor=True, shortestPath=[])
-        # self.maze_widget.update(0)
         self.maze = generateLabyrinth(sizeX, sizeY)
-        mergeMazeGeneration(self.maze, sizeX, sizeY, self)
+        self.maze_widget.random_color = True
+        self.reset_render_state()
+        self.start_run(self.generator, self.generation_steps())
+
+    def generation_steps(self):
+        sizeX = self.maze.width
+        sizeY = self.maze.height
+        yield from METRICS.timed_steps(
+            "generate",
+            GENERATION_STEPS[self.generator](self.maze, sizeX, sizeY, self),
+        )
 
         [start, goal] = append_start_and_goal(self.maze, sizeX, sizeY)
         self.start = start
@@ -171,15 +454,15 @@ class SolverMenuFrame(Frame):
         clear_maze(self.maze)
 
         self.update_maze(self.maze)
-        self.maze_widget.compute(self.maze)
-        self.maze_widget.update_thread()
+        self.reset_render_state()
 
     def dump_buffer(self):
         self.maze_widget.dump_buffer()
 
     def run_place_start_and_goal(self):
-        sizeX = len(self.maze)
-        sizeY = len(self.maze[0])
+        self.cancel_run()
+        sizeX = self.maze.width
+        sizeY = self.maze.height
         self.maze_widget.needs_update = False
         self.maze_widget.total_frames = 0
         self.BFS = False
@@ -191,53 +474,93 @@ class SolverMenuFrame(Frame):
         self.start = start
         self.goal = goal
         self.update_maze(self.maze)
-        self.maze_widget.compute(self.maze)
-        self.maze_widget.update_thread()
+        self.reset_render_state()
+        self.maze_widget.render_pending()
 
         self.screen.refresh()
 
-    def run_bfs(self):
-        # Run the BFS algorithm
+    def prepare_search(self, BFS):
+        """Clear the previous search, `BFS` selects the heat colouring."""
+        self.cancel_run()
         clear_maze(self.maze)
         self.maze_widget.total_frames = 0
-        self.BFS = True
-        self.DFS = False
+        self.BFS = BFS
+        self.DFS = not BFS
         self.shortestPath = []
         self.maze_widget.needs_update = False
         self.update_maze(self.maze)
-
-        BFS(self.maze, maze_effect=self, start=self.start)
-
-        self.shortestPath = compute_shortest_path(
-            self.maze, self.goal, maze_effect=self
-        )
+        self.reset_render_state()
+
+    def search_steps(self, solver_steps, args, shortest_path=True, cache_field=False):
+        """Steps of a search: the solver, then the shortest path if asked.
+
+        `cache_field` then computes the distance field of the start, without
+        showing it, so that the next BFS runs from this start or to it do not
+        search the maze again.
+        """
+        with self.recording(heat=self.BFS) as maze_effect:
+            expanded = yield from METRICS.timed_steps(
+                "solve", solver_steps(self.maze, maze_effect, *args)
+            )
+            METRICS.set("cells_expanded", expanded)
+
+            if shortest_path:
+                self.shortestPath = yield from METRICS.timed_steps(
+                    "path", shortest_path_steps(self.maze, self.goal, maze_effect)
+                )
 
         self.update_maze(self.maze)
-        self.maze_widget.compute(self.maze)
-        self.maze_widget.update_thread()
 
-    def run_dfs(self):
-        clear_maze(self.maze)
-        self.maze_widget.total_frames = 0
-        self.DFS = True
-        self.BFS = False
-        self.shortestPath = []
-        self.update_maze(self.maze)
-        self.maze_widget.needs_update = False
+        if cache_field:
+            yield from METRICS.timed_steps(
+                "distance_field",
+                self.distance_cache.field_steps(
+                    self.maze, self.maze.index(*self.start)
+                ),
+            )
 
-        # Run the DFS algorithm
-        DFS(self.maze, self, self.start)
-        self.update_maze(self.maze)
-        self.maze_widget.compute(self.maze)
-        self.maze_widget.update_thread()
+    def cached_bfs_steps(self, maze, maze_effect, start, goal):
+        """Stands in for bfs_steps when the field of the start or goal is cached.
+
+        The path is walked from the field, no cell is expanded.
+        """
+        self.distance_cache.write_parents(maze, start, goal)
+        yield
+        return 0
 
-        while (
-            not self.maze_widget.thread is None and self.maze_widget.thread.is_alive()
+    def run_bfs(self):
+        self.prepare_search(BFS=True)
+        cache = self.distance_cache
+        if cache.lookup(self.maze, self.maze.index(*self.start)) or cache.lookup(
+            self.maze, self.maze.index(*self.goal)
         ):
-            time.sleep(1 / self.maze_widget.max_fps)
+            self.start_run(
+                "BFS (cached)",
+                self.search_steps(self.cached_bfs_steps, (self.start, self.goal)),
+            )
+        else:
+            self.start_run(
+                "BFS", self.search_steps(bfs_steps, (self.start,), cache_field=True)
+            )
+
+    def run_astar(self):
+        # A* reports its steps like BFS, use the same heat colouring
+        self.prepare_search(BFS=True)
+        self.start_run("A*", self.search_steps(astar_steps, (self.start, self.goal)))
+
+    def run_bidirectional_bfs(self):
+        # Both frontiers use the BFS heat colouring, each in its own colour
+        self.prepare_search(BFS=True)
+        self.start_run(
+            "Bidirectional BFS",
+            self.search_steps(bidirectional_bfs_steps, (self.start, self.goal)),
+        )
 
-        self.screen.clear()
-        self.screen.refresh()
+    def run_dfs(self):
+        self.prepare_search(BFS=False)
+        self.start_run(
+            "DFS", self.search_steps(dfs_steps, (self.start,), shortest_path=False)
+        )
 
     def quit(self):
         raise StopApplication("User chose to quit")
@@ -0,0 +1,106 @@
+"""Step generators: solvers and generators that can be driven step by step.
+
+The engines of solver.py and generation.py are written as generators that
+yield after every step they report to their maze effect, their result is the
+return value of the generator. `run_steps` runs one to its end, this is what
+the plain BFS, DFS, ... functions do. `StepRunner` runs one in time slices
+from a UI loop instead, so a run can be paused, resumed, sped up or cancelled
+while the screen keeps handling input.
+"""
+
+import time
+
+# Longest time a slice runs steps for, so the UI loop keeps its frame rate
+DEFAULT_SLICE_TIME = 1 / 30
+
+
+def run_steps(steps):
+    """Run a step generator to its end, return its result."""
+    try:
+        while True:
+            next(steps)
+    except StopIteration as stop:
+        return stop.value
+
+
+def around_steps(steps, enter, leave):
+    """Yield from `steps`, calling enter() before and leave() after each step.
+
+    Used to time or profile a step generator without counting the time spent
+    between its steps.
+    """
+    try:
+        while True:
+            enter()
+            try:
+                next(steps)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                leave()
+            yield
+    finally:
+        steps.close()
+
+
+class StepRunner:
+    """Drives a step generator by slices of `speed` steps.
+
+    Each call to `advance` runs up to `speed` steps, stopping early once the
+    slice took `slice_time` seconds. Exceptions of the generator, like "No
+    solution", are raised by `advance`. `cancel` closes the generator, so its
+    finally blocks and with statements are run.
+    """
+
+    def __init__(self, steps, speed=1, slice_time=DEFAULT_SLICE_TIME):
+        self.steps = steps
+        self.speed = speed
+        self.slice_time = slice_time
+        self.paused = False
+        self.done = False
+        self.cancelled = False
+        self.result = None
+        self.step_count = 0
+
+    def advance(self, count=None):
+        """Run the next slice, `count` steps instead of `speed` when given.
+
+        Returns True while the generator has steps left.
+        """
+        if self.done:
+            return False
+        if count is None:
+            if self.paused:
+                return True
+            count = self.speed
+        deadline = time.perf_counter() + self.slice_time
+        steps = self.steps
+        for _ in range(count):
+            try:
+                next(steps)
+            except StopIteration as stop:
+                self.result = stop.value
+                self.done = True
+                return False
+            except BaseException:
+                self.done = True
+                raise
+            self.step_count += 1
+            if time.perf_counter() > deadline:
+                break
+        return True
+
+    def cancel(self):
+        if not self.done:
+            self.steps.close()
+            self.done = True
+            self.cancelled = True
+
+    def finish(self):
+        """Run the remaining steps at once, return the result."""
+        if not self.done:
+            try:
+                self.result = run_steps(self.steps)
+            finally:
+                self.done = True
+        return self.result
@@ -0,0 +1,85 @@
+import random
+from collections import deque
+
+from distance_cache import DistanceCache
+from headless import generate_maze
+from maze_constants import KIND_EMPTY, KIND_WALL
+
+
+def brute_force_distances(maze, source):
+    """BFS distance of every (x, y) reachable from `source`."""
+    distances = {tuple(source): 0}
+    queue = deque([tuple(source)])
+    while queue:
+        x, y = queue.popleft()
+        for nextX, nextY in ((x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y)):
+            if (
+                maze.in_bounds(nextX, nextY)
+                and not maze.is_wall(nextX, nextY)
+                and (nextX, nextY) not in distances
+            ):
+                distances[nextX, nextY] = distances[x, y] + 1
+                queue.append((nextX, nextY))
+    return distances
+
+
+def open_cells(maze):
+    return [
+        (x, y)
+        for x in range(maze.width)
+        for y in range(maze.height)
+        if not maze.is_wall(x, y)
+    ]
+
+
+def check_path(maze, path, start, goal, distance):
+    assert path[0] == list(goal) and path[-1] == list(start)
+    assert len(path) == distance + 1
+    for (x, y), (nextX, nextY) in zip(path, path[1:]):
+        assert abs(x - nextX) + abs(y - nextY) == 1
+        assert not maze.is_wall(nextX, nextY)
+
+
+def test_distances_match_brute_force():
+    maze, _, _ = generate_maze(31, 25, rng=random.Random(1))
+    cells = open_cells(maze)
+    cache = DistanceCache()
+    rng = random.Random(2)
+    for start in rng.sample(cells, 5):
+        expected = brute_force_distances(maze, start)
+        for goal in rng.sample(cells, 20):
+            distance = cache.distance(maze, start, goal)
+            assert distance == expected[goal]
+            check_path(maze, cache.path(maze, start, goal), start, goal, distance)
+            # The reverse query is answered from the field of the start
+            assert cache.distance(maze, goal, start) == distance
+    assert cache.misses == 5
+
+
+def test_wall_edit_invalidates_the_fields():
+    maze, _, _ = generate_maze(31, 25, chance=0, rng=random.Random(3))
+    cells = open_cells(maze)
+    cache = DistanceCache()
+    start = cells[0]
+    before = brute_force_distances(maze, start)
+    for goal in cells:
+        cache.distance(maze, start, goal)
+
+    # Labels do not change the distances, the fields are kept
+    maze.set_label(*start, 7)
+    cache.distance(maze, start, cells[-1])
+    assert cache.misses == 1
+
+    # Opening a wall between two cells creates a shortcut
+    wall = next(
+        (x, y)
+        for x in range(1, maze.width - 1, 2)
+        for y in range(0, maze.height, 2)
+        if maze.kind(x, y) == KIND_WALL
+    )
+    maze.set_kind(*wall, KIND_EMPTY)
+    expected = brute_force_distances(maze, start)
+    assert any(expected[goal] != before[goal] for goal in cells)
+    for goal in cells:
+        assert cache.distance(maze, start, goal) == expected[goal]
+    assert cache.misses == 2
@@ -0,0 +1,29 @@
+import random
+
+import pytest
+
+from generation import GENERATORS, generateLabyrinth
+from headless import NullMazeEffect
+from tree_index import TreeIndex
+
+
+def generate(name, width, height, chance, seed):
+    maze = generateLabyrinth(width, height)
+    GENERATORS[name](
+        maze, width, height, NullMazeEffect(), chance=chance, rng=random.Random(seed)
+    )
+    return maze
+
+
+@pytest.mark.parametrize("name", sorted(GENERATORS))
+def test_perfect_maze_without_loops(name):
+    # TreeIndex raises ValueError on a loop or an unreachable cell
+    for seed in range(5):
+        for width, height in ((31, 31), (30, 21), (5, 40)):
+            TreeIndex(generate(name, width, height, 0, seed))
+
+
+def test_eller_opens_loops():
+    with pytest.raises(ValueError, match="loops"):
+        TreeIndex(generate("eller", 31, 31, 0.5, 0))
+
@@ -0,0 +1,38 @@
+import random
+
+from headless import generate_maze
+from maze_constants import KIND_VISITED
+from maze_file import load_maze, open_maze, read_text_maze, save_maze, write_text_maze
+
+
+def test_binary_round_trip(tmp_path):
+    filename = str(tmp_path / "labyrinth.maze")
+    for width, height in ((31, 31), (30, 21)):
+        maze, start, goal = generate_maze(width, height, rng=random.Random(1))
+        save_maze(maze, filename, start, goal)
+
+        loaded, loaded_start, loaded_goal = open_maze(filename)
+        assert (loaded.width, loaded.height) == (width, height)
+        assert bytes(loaded.kinds) == bytes(maze.kinds)
+        assert (loaded_start, loaded_goal) == (list(start), list(goal))
+
+
+def test_binary_load_does_not_write_the_file(tmp_path):
+    filename = str(tmp_path / "labyrinth.maze")
+    maze, start, goal = generate_maze(21, 21, rng=random.Random(2))
+    save_maze(maze, filename, start, goal)
+
+    loaded, _, _ = load_maze(filename)
+    loaded.set_kind(*start, KIND_VISITED)
+    reloaded, _, _ = load_maze(filename)
+    assert bytes(reloaded.kinds) == bytes(maze.kinds)
+
+
+def test_text_round_trip(tmp_path):
+    filename = str(tmp_path / "labyrinth.txt")
+    maze, start, goal = generate_maze(25, 18, rng=random.Random(3))
+    write_text_maze(maze, filename)
+
+    loaded, loaded_start, loaded_goal = read_text_maze(filename)
+    assert bytes(loaded.kinds) == bytes(maze.kinds)
+    assert (loaded_start, loaded_goal) == (list(start), list(goal))
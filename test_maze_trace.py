@@ -0,0 +1,70 @@
+import random
+
+from headless import generate_maze
+from maze_trace import TracePlayer, TraceReader, TraceRecorder
+from solver import BFS
+
+
+class Snapshots:
+    """Maze effect keeping the state of the maze after every recorded step."""
+
+    def __init__(self, maze):
+        self.states = [self.state(maze)]
+
+    @staticmethod
+    def state(maze):
+        return bytes(maze.kinds), maze.labels.tobytes()
+
+    def update_maze(
+        self, maze, randomColor=False, shortestPath=[], queue_size=0, changes=()
+    ):
+        if changes:
+            self.states.append(self.state(maze))
+
+
+def record(filename):
+    maze, start, _ = generate_maze(21, 21, rng=random.Random(5))
+    snapshots = Snapshots(maze)
+    # A short interval spreads the steps over many blocks
+    with TraceRecorder(filename, maze, snapshots, keyframe_interval=7) as recorder:
+        BFS(maze, recorder, start)
+    return snapshots.states
+
+
+def test_seek_to_any_step(tmp_path):
+    filename = str(tmp_path / "run.trace")
+    states = record(filename)
+    reader = TraceReader(filename)
+    assert reader.steps == len(states) - 1
+
+    steps = list(range(reader.steps + 1))
+    random.Random(6).shuffle(steps)
+    for step in steps:
+        assert Snapshots.state(reader.state_at(step)) == states[step]
+
+
+def test_play_backwards(tmp_path):
+    filename = str(tmp_path / "run.trace")
+    states = record(filename)
+    player = TracePlayer(TraceReader(filename), speed=-3)
+
+    kind, maze, _ = player.seek(len(states) - 1)
+    assert kind == "keyframe" and Snapshots.state(maze) == states[-1]
+    while player.position > 0:
+        kind, maze, _ = player.tick()
+        assert kind == "keyframe"
+        assert Snapshots.state(maze) == states[player.position]
+    assert player.tick() is None
+
+
+def test_play_forwards(tmp_path):
+    filename = str(tmp_path / "run.trace")
+    states = record(filename)
+    player = TracePlayer(TraceReader(filename), speed=4)
+
+    _, maze, _ = player.seek(0)
+    while not player.finished:
+        kind, changes, _ = player.tick()
+        assert kind == "changes"
+        maze.apply(changes)
+        assert Snapshots.state(maze) == states[player.position]
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from distance_cache import DistanceCache
+from generation import eller_rows, ellerMazeGeneration, generateLabyrinth
+from headless import NullMazeEffect, generate_maze
+from maze_constants import EMPTY, WALL
+from packed_maze import PackedMaze
+
+
+def test_grid_round_trip():
+    for width, height in ((31, 31), (30, 21), (5, 40)):
+        maze, _, _ = generate_maze(width, height, rng=random.Random(1))
+        unpacked = PackedMaze.from_grid(maze).to_grid()
+        assert (unpacked.width, unpacked.height) == (width, height)
+        assert unpacked.walls() == maze.walls()
+
+
+def test_rows_match_the_grid():
+    # Streamed rows pack to the same walls as the grid built from them
+    width, height = 41, 30
+    maze = generateLabyrinth(width, height)
+    ellerMazeGeneration(maze, width, height, NullMazeEffect(), rng=random.Random(2))
+    rows = eller_rows(width, height, rng=random.Random(2))
+    packed = PackedMaze.from_rows(width, height, rows)
+    assert packed.walls == PackedMaze.from_grid(maze).walls
+
+
+def test_open_border_is_rejected():
+    rows = [[EMPTY, WALL, EMPTY, EMPTY], [WALL] * 4, [EMPTY, WALL, EMPTY, WALL]]
+    with pytest.raises(ValueError, match="Border"):
+        PackedMaze.from_rows(3, 4, rows)
+
+
+def test_bfs_matches_the_grid_distance():
+    width, height = 31, 31
+    maze, _, _ = generate_maze(width, height, rng=random.Random(3))
+    packed = PackedMaze.from_grid(maze)
+    cache = DistanceCache()
+    rng = random.Random(4)
+    for _ in range(20):
+        start = (rng.randrange(0, width, 2), rng.randrange(0, height, 2))
+        goal = (rng.randrange(0, width, 2), rng.randrange(0, height, 2))
+        first = packed.cell(start[0] // 2, start[1] // 2)
+        last = packed.cell(goal[0] // 2, goal[1] // 2)
+        parents, _ = packed.bfs(first, last)
+        path = packed.path(parents, last)
+        assert path[0] == first and path[-1] == last
+        # Every move between two logical cells crosses a wall position
+        assert 2 * (len(path) - 1) == cache.distance(maze, start, goal)
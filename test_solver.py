@@ -0,0 +1,23 @@
+import random
+
+from generation import clear_maze
+from headless import NullMazeEffect, generate_maze
+from solver import BFS, DFS, BidirectionalBFS, compute_shortest_path
+
+
+def test_bidirectional_bfs_after_dfs():
+    # DFS labels the start cell, which clear_maze then turns into an empty cell
+    effect = NullMazeEffect()
+    for seed in range(20):
+        maze, start, goal = generate_maze(31, 31, rng=random.Random(seed))
+        BFS(maze, effect, start)
+        expected = compute_shortest_path(maze, goal, effect)
+        clear_maze(maze)
+
+        DFS(maze, effect, start)
+        clear_maze(maze)
+        BidirectionalBFS(maze, effect, start, goal)
+        path = compute_shortest_path(maze, goal, effect)
+
+        assert len(path) == len(expected)
+        assert path[0] == list(goal) and path[-1] == list(start)
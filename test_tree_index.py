@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from headless import generate_maze
+from maze_constants import KIND_EMPTY, KIND_WALL
+from test_distance_cache import brute_force_distances, check_path, open_cells
+from tree_index import TreeIndex
+
+
+def perfect_maze(seed):
+    maze, _, _ = generate_maze(31, 25, chance=0, rng=random.Random(seed))
+    return maze
+
+
+def check_queries(maze, index, rng):
+    cells = open_cells(maze)
+    for start in rng.sample(cells, 5):
+        expected = brute_force_distances(maze, start)
+        for goal in rng.sample(cells, 20):
+            distance = index.distance(maze, start, goal)
+            assert distance == expected[goal]
+            check_path(maze, index.path(maze, start, goal), start, goal, distance)
+
+
+def test_distances_match_brute_force():
+    for seed in range(3):
+        maze = perfect_maze(seed)
+        check_queries(maze, TreeIndex(maze), random.Random(seed))
+
+
+def test_wall_edit_rebuilds_the_index():
+    maze = perfect_maze(4)
+    index = TreeIndex(maze)
+    start = open_cells(maze)[0]
+
+    # Close a passage, then open the first wall joining the two halves again
+    passage = next(
+        (x, y)
+        for x in range(1, maze.width - 1, 2)
+        for y in range(0, maze.height, 2)
+        if maze.kind(x, y) != KIND_WALL
+    )
+    maze.set_kind(*passage, KIND_WALL)
+    reached = brute_force_distances(maze, start)
+    wall = next(
+        (x, y)
+        for x in range(1, maze.width - 1, 2)
+        for y in range(0, maze.height, 2)
+        if (x, y) != passage
+        and maze.kind(x, y) == KIND_WALL
+        and ((x - 1, y) in reached) != ((x + 1, y) in reached)
+    )
+    maze.set_kind(*wall, KIND_EMPTY)
+
+    check_queries(maze, index, random.Random(5))
+    assert index.walls == maze.walls()
+
+
+def test_loops_are_rejected():
+    maze, _, _ = generate_maze(31, 25, chance=0.2, rng=random.Random(6))
+    with pytest.raises(ValueError, match="loops"):
+        TreeIndex(maze)
+
+    # An index queried after a wall edit creating a loop rebuilds and fails
+    maze = perfect_maze(7)
+    index = TreeIndex(maze)
+    cells = open_cells(maze)
+    wall = next(
+        (x, y)
+        for x in range(1, maze.width - 1, 2)
+        for y in range(0, maze.height, 2)
+        if maze.kind(x, y) == KIND_WALL
+    )
+    maze.set_kind(*wall, KIND_EMPTY)
+    with pytest.raises(ValueError, match="loops"):
+        index.distance(maze, cells[0], cells[-1])
@@ -0,0 +1,152 @@
+"""Index of a perfect maze answering path queries without searching it.
+
+A perfect maze, e.g. mergeMazeGeneration with chance=0, has exactly one path
+between any two cells: its open cells form a spanning tree. The index roots
+that tree and keeps, for every cell, its depth, its parent and a jump pointer
+to a further ancestor. The jump pointers follow the skew-binary scheme of
+Myers: each is computed from the parent's in O(1), so the index is built by a
+single BFS in O(N) and 12 bytes per cell, while reaching any ancestor, and so
+the lowest common ancestor of two cells, takes O(log N) jumps.
+
+    distance(a, b) = depth[a] + depth[b] - 2 * depth[lca(a, b)]
+
+is then O(log N) and the path itself is O(path) by climbing from both cells to
+their lowest common ancestor.
+
+The index remembers the version of the maze it was built on, a query after an
+edit of the walls rebuilds it.
+"""
+
+import weakref
+from array import array
+from collections import deque
+
+from maze_constants import KIND_WALL
+from solver import get_open_neighbor_directions
+
+
+class TreeIndex:
+    """Depth, parent and jump pointer of every open cell of a perfect maze.
+
+    Raises ValueError when the open cells of the maze do not form a tree, i.e.
+    the maze has loops or unreachable parts.
+    """
+
+    def __init__(self, maze):
+        self._maze = weakref.ref(maze)
+        self.build(maze)
+
+    def build(self, maze):
+        """Root the tree at the first open cell and fill the tables by BFS."""
+        kinds = maze.kinds
+        size = len(kinds)
+        root = next((i for i, kind in enumerate(kinds) if kind != KIND_WALL), None)
+        if root is None:
+            raise ValueError("Maze has no open cell")
+        depth = array("i", [-1]) * size
+        parent = array("i", [-1]) * size
+        jump = array("i", [-1]) * size
+        depth[root] = 0
+        parent[root] = jump[root] = root
+        queue = deque([root])
+        cells = 1
+
+        while queue:
+            index = queue.popleft()
+            cell_depth = depth[index]
+            # Jump of the children: twice as far as the jump of this cell when
+            # its jump and the jump of its jump cover the same distance
+            far = jump[index]
+            if cell_depth - depth[far] == depth[far] - depth[jump[far]]:
+                child_jump = jump[far]
+            else:
+                child_jump = index
+            for _, neighbor in get_open_neighbor_directions(maze, index):
+                if neighbor == parent[index]:
+                    continue
+                if depth[neighbor] >= 0:
+                    raise ValueError("Maze is not perfect: it has loops")
+                depth[neighbor] = cell_depth + 1
+                parent[neighbor] = index
+                jump[neighbor] = child_jump
+                queue.append(neighbor)
+                cells += 1
+
+        walls = maze.walls()
+        if cells != size - walls.count(1):
+            raise ValueError("Maze is not perfect: some cells are unreachable")
+        self.root = root
+        self.depth = depth
+        self.parent = parent
+        self.jump = jump
+        self.version = maze.version
+        self.walls = walls
+
+    def _current(self, maze):
+        """Check that `maze` is the indexed maze, rebuild when its walls changed."""
+        if self._maze() is not maze:
+            raise ValueError("TreeIndex queried with another maze")
+        if maze.version != self.version:
+            if maze.walls() != self.walls:
+                self.build(maze)
+            else:
+                self.version = maze.version
+
+    def ancestor(self, index, target_depth):
+        """Ancestor of the flat index `index` at `target_depth`, in O(log N)."""
+        depth, parent, jump = self.depth, self.parent, self.jump
+        while depth[index] > target_depth:
+            if depth[jump[index]] >= target_depth:
+                index = jump[index]
+            else:
+                index = parent[index]
+        return index
+
+    def lca(self, a, b):
+        """Lowest common ancestor of two flat indexes, in O(log N)."""
+        depth, parent, jump = self.depth, self.parent, self.jump
+        if depth[a] < depth[b]:
+            a, b = b, a
+        a = self.ancestor(a, depth[b])
+        # At the same depth the jumps of a and b land at the same depth too
+        while a != b:
+            if jump[a] != jump[b]:
+                a, b = jump[a], jump[b]
+            else:
+                a, b = parent[a], parent[b]
+        return a
+
+    def distance(self, maze, start, goal):
+        """Length of the path between two cells given as (x, y)."""
+        self._current(maze)
+        a, b = maze.index(*start), maze.index(*goal)
+        self._check_open(a, b)
+        depth = self.depth
+        return depth[a] + depth[b] - 2 * depth[self.lca(a, b)]
+
+    def chain(self, maze, start, goal):
+        """Flat indexes of the path from the goal to the start, in O(path)."""
+        self._current(maze)
+        a, b = maze.index(*start), maze.index(*goal)
+        self._check_open(a, b)
+        common = self.lca(a, b)
+        parent = self.parent
+        from_goal = [b]
+        while b != common:
+            b = parent[b]
+            from_goal.append(b)
+        from_start = []
+        while a != common:
+            from_start.append(a)
+            a = parent[a]
+        from_start.reverse()
+        return from_goal + from_start
+
+    def path(self, maze, start, goal):
+        """Path as a list of [x, y] from the goal to the start, like the solvers."""
+        return [list(maze.position(index)) for index in self.chain(maze, start, goal)]
+
+    def _check_open(self, *indexes):
+        for index in indexes:
+            if self.depth[index] < 0:
+                raise ValueError("Cell is a wall")